@@ -1,19 +1,35 @@
 # app.py
+# First, so the "imports" phase of --profile covers everything below
+import profiling
+from profiling import span
+
 import os
 import sys
+import threading
+import time
+from dataclasses import replace
 from datetime import date
 
 from prompts import AM_QUESTIONS, PM_QUESTIONS
-from coach import run_am, run_pm
-from config import AppConfig, load_config, save_config, config_path
-from dj_secrets import set_openai_api_key, get_openai_api_key
+from config import load_config, save_config, config_path
+
+# coach (openai SDK) and dj_secrets (keyring) are slow to import, so they are
+# imported inside the commands that need them. See bench/coldstart.py.
 
+import outbox
 from entries import (
-    export_entry, 
     wipe_sync_dir_entries,
-    read_entry_file,
     iter_entry_files,
-    export_note,
+    iter_parsed_entries,
+    sync_dir_mtime_ns,
+    write_jsonl,
+)
+
+from segments import (
+    compact_sync_dir,
+    iter_segment_files,
+    read_segment_entries,
+    read_segment_index,
 )
 
 from store import (
@@ -21,21 +37,33 @@ from store import (
     insert_session,
     get_latest_am,
     get_latest_am_full,
-    get_last_n_summaries,
+    iter_history,
     get_latest_pm_with_tomorrow_focus,
     delete_db_file,
     # sync tracking for cloud imports
-    is_file_imported,
+    get_imported_file_names,
+    import_entries,
+    get_sync_state,
+    set_sync_state,
+    filter_imported,
     mark_file_imported,
-    insert_session_from_icloud,
-    import_note_from_icloud,
     # notes
     get_notes,
     add_note,
+    # full-text search
+    search,
+    # rollups
+    get_accountability_stats,
+    # bulk export
+    iter_export_rows,
+    # compressed text storage
+    convert_text_storage,
 )
 
 APP_VERSION = "0.1.3"
-DEFAULT_MODEL = load_config().model
+
+def default_model() -> str:
+    return load_config().model
 
 def ask_questions(questions):
     answers = []
@@ -59,6 +87,54 @@ def ask_multiline(prompt: str) -> str:
     return "\n".join(lines).strip()
 
 
+class SummaryPrinter:
+    """
+    Prints a session summary as it streams in from the LLM.
+    finish() prints the whole summary instead if nothing was streamed.
+    """
+
+    def __init__(self, title: str):
+        self.title = title
+        self.streamed = False
+
+    def __call__(self, text: str) -> None:
+        if not self.streamed:
+            print(f"\n--- {self.title} ---")
+            self.streamed = True
+        print(text, end="", flush=True)
+
+    def end_stream(self) -> None:
+        if self.streamed:
+            print()
+
+    def finish(self, summary: str) -> None:
+        if self.streamed:
+            return
+        print(f"\n--- {self.title} ---")
+        print(summary)
+
+
+def _warm_up_llm(model: str) -> None:
+    """Imports the OpenAI layer and opens the API connection off the main thread."""
+    def _warm():
+        try:
+            with span("import coach"):
+                from coach import warm_up
+            warm_up(model)
+        except Exception:
+            pass
+
+    threading.Thread(target=_warm, name="dj-warm-up", daemon=True).start()
+
+
+def _save_session(payload: dict) -> None:
+    # The entry file is written in the background (see outbox.py)
+    queued = insert_session(payload, export=True)
+    if queued:
+        outbox.flush_in_background()
+        print(f"\n(cloud) saving entry file: {queued}")
+
+
 def am_session():
     last_pm = get_latest_pm_with_tomorrow_focus()
     if last_pm and last_pm.get("tomorrow_focus"):
@@ -66,11 +142,29 @@ def am_session():
         print(f"→ {last_pm['tomorrow_focus']}") 
 
     today = date.today().isoformat() 
+    model = default_model()
+    cfg = load_config()
+    pipeline = cfg.pipeline
+    if pipeline:
+        _warm_up_llm(model)
+
     answers = ask_questions(AM_QUESTIONS)
 
+    with span("import coach"):
+        from coach import Speculation, run_am
+
+    # The optional notes aren't part of the AM request, so it can go out now
+    speculation = Speculation(run_am, model, answers, stream=cfg.stream) if pipeline else None
+
     additional = ask_multiline("Any additional notes for this morning? (optional)")
 
-    data = run_am(DEFAULT_MODEL, answers)
+    printer = SummaryPrinter("AM SUMMARY")
+    on_summary = printer if cfg.stream else None
+    if speculation:
+        data = speculation.result(model, answers, on_summary=on_summary)
+    else:
+        data = run_am(model, answers, on_summary=on_summary)
+    printer.end_stream()
 
     payload = {
         "session_date": today,
@@ -83,17 +177,26 @@ def am_session():
         "free_text": additional or None,
     }
 
-    insert_session(payload)
-    exported = export_entry(payload)
-    if exported:
-        print(f"\n(cloud) wrote entry file: {exported.name}")
+    _save_session(payload)
+
+    printer.finish(data["summary"])
 
-    print("\n--- AM SUMMARY ---")
-    print(data["summary"])
+
+def _pm_llm_context(am: dict | None, today: str) -> dict:
+    append_notes = get_notes(today, "am")
+    am_for_llm = dict(am or {})
+    if append_notes:
+        am_for_llm["append_notes"] = append_notes
+    return am_for_llm
 
 
 def pm_session():
     today = date.today().isoformat()
+    model = default_model()
+    cfg = load_config()
+    pipeline = cfg.pipeline
+    if pipeline:
+        _warm_up_llm(model)
 
     am_full = get_latest_am_full(today)
     am = am_full  # reuse for existing logic
@@ -124,14 +227,27 @@ def pm_session():
         ]
 
     answers = ask_questions(pm_questions)
+
+    with span("import coach"):
+        from coach import Speculation, run_pm
+
+    # Send the PM request while the user types optional notes; if an append
+    # note lands in the meantime, result() re-issues it with the new input
+    speculation = (
+        Speculation(run_pm, model, _pm_llm_context(am, today), answers, stream=cfg.stream) if pipeline else None
+    )
+
     additional = ask_multiline("Any additional notes for tonight? (optional)")
 
-    append_notes = get_notes(today, "am")
-    am_for_llm = dict(am or {})
-    if append_notes:
-        am_for_llm["append_notes"] = append_notes
+    am_for_llm = _pm_llm_context(am, today)
 
-    data = run_pm(DEFAULT_MODEL, am_for_llm, answers)
+    printer = SummaryPrinter("PM SUMMARY")
+    on_summary = printer if cfg.stream else None
+    if speculation:
+        data = speculation.result(model, am_for_llm, answers, on_summary=on_summary)
+    else:
+        data = run_pm(model, am_for_llm, answers, on_summary=on_summary)
+    printer.end_stream()
 
     payload = {
         "session_date": today,
@@ -146,15 +262,13 @@ def pm_session():
         "free_text": additional or None,
     }
 
-    insert_session(payload)
-    exported = export_entry(payload)
-    if exported:
-        print(f"\n(cloud) wrote entry file {exported.name}")
+    _save_session(payload)
 
-    print("\n--- PM SUMMARY ---")
-    print(data["summary"])
+    printer.finish(data["summary"])
 
 def setup_wizard():
+    from dj_secrets import set_openai_api_key, get_openai_api_key
+
     print("dailyjournal setup\n")
 
     cfg = load_config()
@@ -188,7 +302,7 @@ def setup_wizard():
     else:
         print("Keeping existing API key (if any).")
 
-    new_cfg = AppConfig(db_path=db_path, export_dir=export_dir, model=model)
+    new_cfg = replace(cfg, db_path=db_path, export_dir=export_dir, model=model)
     path = save_config(new_cfg)
     print(f"\nSaved config to: {path}")
 
@@ -200,44 +314,365 @@ def setup_wizard():
     print("\nSetup complete. Try:")
     print("  dailyjournal am")
 
-def show_last():
-    rows = get_last_n_summaries(10)
+def show_last(n: int = 10):
     print("\nRECENT ENTRIES")
-    for r in rows:
-        first_line = r["summary"].splitlines()[0]
-        print(f"{r['date']} [{r['type'].upper()}] {first_line}")
+    for r in iter_history(limit=n):
+        print(f"{r['date']} [{r['type'].upper()}] {r['headline']}")
+
+def show_history(args: list[str]):
+    args = list(args)
+    date_from = _take_option(args, "--from")
+    date_to = _take_option(args, "--to")
+
+    print(f"\nHISTORY {date_from or '…'} → {date_to or '…'}")
+    for r in iter_history(date_from=date_from, date_to=date_to, newest_first=False):
+        print(f"{r['date']} [{r['type'].upper()}] {r['headline']}")
+
+def _take_option(args: list[str], flag: str, default: str | None = None) -> str | None:
+    """Removes `flag VALUE` from args and returns VALUE (default if the flag is absent)."""
+    if flag not in args:
+        return default
+    i = args.index(flag)
+    if i + 1 >= len(args):
+        print(f"Missing value for {flag}.")
+        sys.exit(2)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
 
-def sync_from_icloud_on_startup() -> None:
-    files = iter_entry_files()
-    if not files:
+def search_entries(args: list[str]) -> None:
+    args = list(args)
+    date_from = _take_option(args, "--from")
+    date_to = _take_option(args, "--to")
+    session_type = _take_option(args, "--type")
+    limit = int(_take_option(args, "--n", "20"))
+    query = " ".join(args).strip()
+
+    if not query:
+        print("Usage: dailyjournal search <words...> [--from YYYY-MM-DD] [--to YYYY-MM-DD] [--type am|pm|free|note] [--n N]")
+        sys.exit(2)
+
+    started = time.perf_counter()
+    results = search(query, limit=limit, date_from=date_from, date_to=date_to,
+                     session_type=session_type.lower() if session_type else None)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(f"\nSEARCH: {query}  ({len(results)} result{'' if len(results) == 1 else 's'}, {elapsed_ms:.1f} ms)")
+    for r in results:
+        snippet = " ".join(r["snippet"].split())
+        print(f"{r['date']} [{r['type'].upper()}] {snippet}")
+
+def compact(args: list[str]):
+    args = list(args)
+    before = _take_option(args, "--before")
+
+    # The startup sync in main() has already imported every loose file
+    counts = compact_sync_dir(before)
+    print(
+        f"Packed {counts['packed']} file(s) into {counts['segments']} segment(s); "
+        f"removed {counts['removed']} loose file(s)."
+    )
+    if counts["failed"]:
+        print(f"{counts['failed']} unreadable file(s) were left in place.")
+
+def export_all(args: list[str]):
+    args = list(args)
+    out = _take_option(args, "--out")
+    date_from = _take_option(args, "--from")
+    date_to = _take_option(args, "--to")
+    session_type = _take_option(args, "--type")
+    compress = "--gzip" in args or bool(out and out.endswith(".gz"))
+
+    if compress and not out:
+        print("--gzip needs --out FILE.", file=sys.stderr)
+        sys.exit(2)
+
+    from pathlib import Path
+    out_path = Path(out).expanduser() if out else None
+
+    started = time.perf_counter()
+    rows = iter_export_rows(date_from=date_from, date_to=date_to,
+                            session_type=session_type.lower() if session_type else None)
+    try:
+        count = write_jsonl(rows, out_path, compress=compress)
+    except BrokenPipeError:
+        # The reader went away (`export | head`): stop quietly, and point stdout
+        # at devnull so the flush at exit doesn't raise again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    if out_path:
+        print(f"Exported {count} row(s) to {out_path} in {elapsed:.2f}s.")
+
+def resummarize_history(args: list[str]):
+    args = list(args)
+    model = _take_option(args, "--model") or default_model()
+    concurrency = int(_take_option(args, "--concurrency", "4"))
+    write_to = _take_option(args, "--write-batch")
+    ingest_from = _take_option(args, "--ingest-batch")
+    date_from = _take_option(args, "--from")
+    date_to = _take_option(args, "--to")
+    session_type = _take_option(args, "--type")
+    session_type = session_type.lower() if session_type else None
+
+    from pathlib import Path
+    import resummarize
+
+    key = resummarize.job_key(model)
+    if "--restart" in args:
+        print(f"Forgot progress for {resummarize.reset(key)} session(s).")
+
+    if ingest_from:
+        counts = resummarize.ingest_batch(Path(ingest_from).expanduser(), model)
+        print(f"Updated {counts['done']} summar{'y' if counts['done'] == 1 else 'ies'}; {counts['failed']} failed.")
+        return
+    if write_to:
+        count = resummarize.write_batch(Path(write_to).expanduser(), model, date_from, date_to, session_type)
+        print(f"Wrote {count} request(s) to {write_to}. Ingest the results with --ingest-batch FILE --model {model}.")
         return
 
-    imported = 0
-    skipped = 0
+    pending = resummarize.count_pending(key, date_from, date_to, session_type)
+    if not pending:
+        print(f"Nothing to do: every summary is up to date for {model} and the current rules.")
+        return
+    if "--yes" not in args:
+        answer = input(f"Regenerate {pending} summar{'y' if pending == 1 else 'ies'} with {model}? [y/N] ")
+        if answer.strip().lower() not in ("y", "yes"):
+            print("Aborted.")
+            return
+
+    started = time.perf_counter()
+    counts = resummarize.run(model, concurrency, date_from, date_to, session_type)
+    print(
+        f"Updated {counts['done']} summar{'y' if counts['done'] == 1 else 'ies'} in "
+        f"{time.perf_counter() - started:.1f}s; {counts['failed']} failed (run again to retry)."
+    )
+
+def show_review(args: list[str]):
+    args = list(args)
+    model = _take_option(args, "--model") or default_model()
+
+    import rollups
+
+    grain = period = None
+    for g in ("week", "month", "year"):
+        if f"--{g}" in args:
+            i = args.index(f"--{g}")
+            value = args[i + 1] if i + 1 < len(args) else None
+            grain = g
+            period = value if value and not value.startswith("--") else rollups.period_key(g, date.today())
+    if grain is None:
+        print("Usage: dailyjournal review --week [YYYY-Www] | --month [YYYY-MM] | --year [YYYY]")
+        sys.exit(2)
 
-    for path in files:
-        name = path.name
+    import review
 
-        if is_file_imported(name):
-            skipped += 1
-            continue
+    calls = {"llm": 0}
+    printer = SummaryPrinter(f"REVIEW {period}")
+    on_summary = printer if load_config().stream else None
+    text = review.review(model, grain, period, calls, on_summary)
+    printer.end_stream()
+    if text is None:
+        print(f"No entries for {period}.")
+        return
+    printer.finish(text)
+    print(f"\n({calls['llm']} new LLM call(s); the rest came from cached digests)")
 
-        try:
-            entry = read_entry_file(path)
+def show_similar(args: list[str]):
+    args = list(args)
+    k = int(_take_option(args, "--n", "5"))
+    day = _take_option(args, "--date")
+    rebuild = "--rebuild" in args
+    words = [a for a in args if a != "--rebuild"]
+
+    import vectors
+
+    added = vectors.update_index(rebuild=rebuild)
+    if added:
+        print(f"(similar) Indexed {added} new entr{'y' if added == 1 else 'ies'}.")
 
-            if entry.get("entry_kind") == "note":
-                import_note_from_icloud(entry)
-            else:
-                insert_session_from_icloud(entry)
+    if words:
+        query, exclude, label = " ".join(words), None, f'"{" ".join(words)}"'
+    else:
+        day = day or date.today().isoformat()
+        query, exclude, label = vectors.session_query(day), day, day
+        if query is None:
+            print(f"No entry for {day}. Pass some text or --date YYYY-MM-DD.")
+            return
+
+    results = vectors.similar(query, k=k, exclude_date=exclude)
+    if not results:
+        print("No similar entries found.")
+        return
+    print(f"\nDAYS LIKE {label}")
+    for r in results:
+        print(f"{r['date']} [{r['type'].upper()}] {r['score']:.2f}  {r['headline']}")
 
-            mark_file_imported(name)
-            imported += 1
+def show_cache(args: list[str]):
+    import llm_cache
+
+    if "--clear" in args:
+        removed = llm_cache.clear()
+        print(f"Cleared {removed} cached response(s).")
+        return
+
+    stats = llm_cache.stats()
+    enabled = "on" if load_config().llm_cache else "off (set llm_cache = true in config.toml)"
+    rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate'] * 100:.0f}%"
+    print(f"\nLLM RESPONSE CACHE: {enabled}")
+    print(f"- Entries: {stats['entries']} ({stats['bytes'] / 1024:.1f} KiB)")
+    print(f"- Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {rate}")
+
+def compress_storage(args: list[str]):
+    compress = "--off" not in args
+    print(("Compressing" if compress else "Decompressing") + " stored transcripts and summaries...")
+    counts = convert_text_storage(compress)
+    cfg = load_config()
+    if cfg.compress_text != compress:
+        save_config(replace(cfg, compress_text=compress))
+    saved = counts["before"] - counts["after"]
+    print(
+        f"Rewrote {counts['changed']} session(s). Database: {counts['before'] / 1e6:.1f} MB -> "
+        f"{counts['after'] / 1e6:.1f} MB ({'saved' if saved >= 0 else 'grew'} {abs(saved) / 1e6:.1f} MB)."
+    )
+    print(f"compress_text = {'true' if compress else 'false'} in {config_path()}")
+
+def _pct(rate: float | None) -> str:
+    return "  -" if rate is None else f"{rate * 100:3.0f}%"
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+def show_llm_usage(days: int):
+    import llm_stats
+
+    print(f"\nLLM CALLS (last {days} days)")
+    models = llm_stats.latency_by_model(days)
+    if not models:
+        print("- No LLM calls recorded.")
+        return
+    print(f"  {'Model':<16} {'Calls':>5} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'TTFB p50':>8} {'Errors':>6} {'Retries':>7} {'Cached':>6}")
+    for m in models:
+        print(
+            f"  {m['model']:<16} {m['calls']:>5} {_ms(m['p50_ms']):>7} {_ms(m['p95_ms']):>7} {_ms(m['p99_ms']):>7} "
+            f"{_ms(m['ttfb_p50_ms']):>8} {_pct(m['error_rate']):>6} {m['retries']:>7} {m['cache_hits']:>6}"
+        )
+
+    print(f"\nLLM TOKENS (last {days} days)")
+    print(f"  {'':<11} {'Calls':>5} {'Input':>8} {'Cached':>8} {'Output':>8} {'Est. in/call':>12}")
+    for r in llm_stats.usage_by_mode(days):
+        print(
+            f"  {r['mode'].upper():<11} {r['calls']:>5} {r['input_tokens']:>8} {r['cached_input_tokens']:>8} "
+            f"{r['output_tokens']:>8} {r['estimated_input_tokens'] // r['calls']:>12}"
+        )
+
+def show_stats(args: list[str]):
+    if "--llm" in args:
+        show_llm_usage(int(_take_option(args, "--days", "30")))
+        return
+
+    stats = get_accountability_stats(date.today())
+
+    print("\nSTREAKS (current / longest)")
+    labels = {"journal": "PM review", "work": "Work One Thing", "family": "Family One Thing"}
+    for kind, label in labels.items():
+        s = stats["streaks"][kind]
+        longest = s["longest"]
+        run = f" ({longest['start']} → {longest['end']})" if longest["length"] else ""
+        print(f"- {label:<17} {s['current']:>3} / {longest['length']:<3}{run}")
+
+    print("\nCOMPLETION")
+    print(f"  {'':<11} {'AM':>4} {'PM':>4} {'Work':>5} {'Family':>6}  AM without PM")
+    for p in stats["periods"]:
+        print(
+            f"  {p['label']:<11} {p['am']:>4} {p['pm']:>4} {_pct(p['work_rate']):>5} "
+            f"{_pct(p['family_rate']):>6}  {p['am_without_pm_days']} day(s)"
+        )
+
+def sync_from_icloud_on_startup(full: bool = False) -> None:
+    """
+    Imports new entry files from the sync dir.
+    Nothing is listed when the sync dir mtime is unchanged; otherwise every
+    file name is diffed against imported_files (names only - files are read
+    only when new). full=True skips the mtime check.
+    """
+    state = get_sync_state()
+    dir_mtime = sync_dir_mtime_ns()
+    if dir_mtime is None:
+        return
+    if not full and state.get("dir_mtime_ns") == str(dir_mtime):
+        return
+
+    started = time.perf_counter()
+    # Every name is checked, whatever its date: files from a machine that was
+    # offline for a week (or with a skewed clock) can arrive in any order
+    files = iter_entry_files(skip=get_imported_file_names())
+
+    # Segments (see segments.py) hold older entries; finished ones are skipped by name
+    segment_work = []
+    segment_files = iter_segment_files()
+    finished_segments = filter_imported(p.name for p in segment_files)
+    for seg in segment_files:
+        if seg.name in finished_segments:
+            continue
+        try:
+            members = [name for name, _, _ in read_segment_index(seg)]
         except Exception as e:
-            # Don't crash the whole app because one file is bad
-            print(f"(sync) WARNING: failed to import {name}: {e}")
+            print(f"(sync) WARNING: failed to read segment {seg.name}: {e}", file=sys.stderr)
+            continue
+        segment_work.append((seg, set(members) - filter_imported(members)))
+
+    failed_segments = set()
+
+    def parsed_entries():
+        seen = set()
+        # Files are read on a bounded pool; this thread is the only DB writer
+        for name, entry, error in iter_parsed_entries(files):
+            if error is not None:
+                # Don't crash the whole app because one file is bad
+                print(f"(sync) WARNING: failed to import {name}: {error}", file=sys.stderr)
+                continue
+            seen.add(name)
+            yield name, entry
+
+        for seg, wanted in segment_work:
+            # A loose file and its packed copy can coexist after an interrupted compact
+            wanted = wanted - seen
+            if not wanted:
+                continue
+            try:
+                for name, entry in read_segment_entries(seg, wanted):
+                    seen.add(name)
+                    yield name, entry
+            except Exception as e:
+                print(f"(sync) WARNING: failed to import from segment {seg.name}: {e}", file=sys.stderr)
+                failed_segments.add(seg.name)
+
+    counts = import_entries(parsed_entries())
+    unfinished = 0
+    for seg, wanted in segment_work:
+        # A segment is done only once every entry it was read for is imported;
+        # otherwise the next run retries the rest (a read error, a bad entry)
+        if seg.name not in failed_segments and len(filter_imported(wanted)) == len(wanted):
+            mark_file_imported(seg.name)
+        else:
+            unfinished += 1
+    # An unfinished segment leaves the mtime unrecorded, so the next startup retries it
+    if not unfinished:
+        set_sync_state({"dir_mtime_ns": str(dir_mtime)})
+
+    imported = counts["sessions"] + counts["notes"]
+    elapsed = time.perf_counter() - started
 
     if imported:
-        print(f"(sync) Imported {imported} new cloud entr{'y' if imported == 1 else 'ies'}.")
+        rate = imported / elapsed if elapsed > 0 else float(imported)
+        print(
+            f"(sync) Imported {imported} new cloud entr{'y' if imported == 1 else 'ies'} "
+            f"({rate:,.0f} rows/s).",
+            file=sys.stderr,
+        )
 
 def _extract_am_derail_risk(raw_transcript: str) -> str | None:
     # raw_transcript lines look like: "AM Q3: <text>"
@@ -294,22 +729,24 @@ def append_note(note_text_arg: str | None = None) -> None:
         print("No note entered.")
         return
 
-    add_note(today, "am", note_text)
-
-    exported = export_note(today, "am", note_text)
-    if exported:
-        print(f"\n(cloud) wrote note file: {exported.name}")
+    queued = add_note(today, "am", note_text, export=True)
+    if queued:
+        outbox.flush_in_background()
+        print(f"\n(cloud) saving note file: {queued}")
 
     print("\n--- NOTE APPENDED ---")
 
+# Commands that read or write the journal; only these pay for init_db and the
+# startup cloud sync.
+DB_COMMANDS = {"am", "pm", "last", "free_entry", "free", "free_text", "append", "sync", "search", "stats", "history", "export", "compact", "cache", "resummarize", "review", "similar", "compress"}
+
 def main():
+    profiling.configure(sys.argv)
+
     if "--version" in sys.argv or "-V" in sys.argv:
         print(APP_VERSION)
         sys.exit(0)
 
-    init_db()
-    sync_from_icloud_on_startup()
-
     if len(sys.argv) < 2 or sys.argv[1] in ("help", "-h", "--help"):
         print("""
 dailyjournal — AM/PM journaling with accountability
@@ -318,29 +755,54 @@ Usage:
   dailyjournal setup            First time setup - will set configuration files (OpenAI Key, backup paths, etc.)
   dailyjournal am               Run morning session
   dailyjournal pm               Run evening session
-  dailyjournal last             Show recent summaries
+  dailyjournal last [--n N]     Show recent summaries (default 10)
+  dailyjournal history          List entries oldest first [--from YYYY-MM-DD] [--to YYYY-MM-DD]
   dailyjournal help             Show this help
   dailyjournal free_entry       Enter free text, not used with a template
   dailyjournal free             Enter free text, not used with a template
   dailyjournal free_text        Enter free text, not used with a template
   dailyjournal wipe [--icloud]  Erases the local journal, (also wipes the icloud sync if icloud argument is passed)
   dailyjournal append [text]    Append a note to today's AM (one-liner or multiline)
+  dailyjournal sync [--full]    Import new cloud entry files (--full rescans the whole sync dir)
+  dailyjournal search <words>   Full-text search [--from DATE] [--to DATE] [--type am|pm|free|note] [--n N]
+  dailyjournal review           LLM retrospective: --week [YYYY-Www] | --month [YYYY-MM] | --year [YYYY]
+  dailyjournal similar [text]   Past days most like today (or like text) [--date YYYY-MM-DD] [--n N] [--rebuild]
+  dailyjournal stats            Streaks and completion rates (--llm [--days N]: LLM latency, errors, tokens)
+  dailyjournal compact          Pack older entry files into monthly segments [--before YYYY-MM]
+  dailyjournal cache [--clear]  Show (or clear) the LLM response cache
+  dailyjournal compress [--off] Store long transcripts/summaries compressed (--off: plain) and report space saved
+  dailyjournal export           Dump sessions + notes as JSONL [--out FILE[.gz]] [--gzip] [--from] [--to] [--type]
+  dailyjournal resummarize      Regenerate AM/PM summaries with the current rules/model [--model M] [--concurrency N]
+                                [--from] [--to] [--type am|pm] [--restart] [--yes] [--write-batch FILE | --ingest-batch FILE]
+
+Any command also accepts --profile (phase timings at exit) and --profile-out FILE (.json: Chrome trace, else cProfile).
 
 Examples:
   dailyjournal am
   dailyjournal pm
   dailyjournal append "Got 3178 done; follow up tomorrow"
+  dailyjournal search 3178 --from 2025-01-01
 """)
         sys.exit(0)
 
     cmd = sys.argv[1].lower()
 
+    if cmd in DB_COMMANDS:
+        with span("init_db"):
+            init_db()
+        if cmd != "sync":
+            with span("sync"):
+                sync_from_icloud_on_startup()
+        outbox.resume()
+
     if cmd == "am":
         am_session()
     elif cmd == "pm":
         pm_session()
     elif cmd == "last":
-        show_last()
+        show_last(int(_take_option(sys.argv[2:], "--n", "10")))
+    elif cmd == "history":
+        show_history(sys.argv[2:])
     elif cmd in ("free_entry", "free", "free_text"):
         free_entry()
     elif cmd == "wipe":
@@ -351,6 +813,26 @@ Examples:
         append_note(note_text_arg)
     elif cmd == "setup":
         setup_wizard()
+    elif cmd == "sync":
+        sync_from_icloud_on_startup(full=("--full" in sys.argv))
+    elif cmd == "search":
+        search_entries(sys.argv[2:])
+    elif cmd == "stats":
+        show_stats(sys.argv[2:])
+    elif cmd == "export":
+        export_all(sys.argv[2:])
+    elif cmd == "compact":
+        compact(sys.argv[2:])
+    elif cmd == "cache":
+        show_cache(sys.argv[2:])
+    elif cmd == "compress":
+        compress_storage(sys.argv[2:])
+    elif cmd == "resummarize":
+        resummarize_history(sys.argv[2:])
+    elif cmd == "review":
+        show_review(sys.argv[2:])
+    elif cmd == "similar":
+        show_similar(sys.argv[2:])
     else: 
         print("Unknown command. Run `dailyjournal help`.")
         sys.exit(2)
@@ -375,11 +857,7 @@ def free_entry():
         "free_text": text,
     }
 
-    insert_session(payload)
-
-    exported = export_entry(payload)
-    if exported:
-        print(f"\n(cloud) wrote entry file: {exported.name}")
+    _save_session(payload)
 
     print("\n--- FREE ENTRY SAVED ---")
 
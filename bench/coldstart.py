@@ -0,0 +1,105 @@
+# bench/coldstart.py
+"""
+Cold-start budget for the dailyjournal entry point.
+
+Runs cheap commands in a fresh interpreter under `python -X importtime` and
+exits non-zero when a command's total import time goes over its budget, or
+when it imports a heavy dependency it has no use for (openai, keyring, ...).
+
+    python bench/coldstart.py
+    python bench/coldstart.py --scale 2.0     # slower machine / CI runner
+    python bench/coldstart.py --json          # machine-readable results
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Import-time budgets in milliseconds (best of --runs). These commands never
+# talk to the LLM, so anything near the cost of the openai SDK is a regression.
+BUDGETS_MS = {
+    "--version": 100.0,
+    "help": 100.0,
+    "last": 120.0,
+}
+
+# Top-level modules that must not be imported by the commands above.
+FORBIDDEN = ("openai", "keyring", "httpx", "pydantic", "anyio", "coach", "dj_secrets")
+
+
+def _parse_importtime(stderr: str) -> tuple[float, set[str]]:
+    """Returns (total self time in ms, set of imported top-level module names)."""
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        total_us += int(parts[0])
+        modules.add(parts[2].strip().split(".")[0])
+    return total_us / 1000.0, modules
+
+
+def measure(cmd: str, env: dict[str, str]) -> tuple[float, set[str]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(ROOT / "app.py"), cmd],
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+    )
+    return _parse_importtime(proc.stderr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--scale", type=float, default=1.0, help="multiply every budget")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update(
+            HOME=tmp,
+            DAILYJOURNAL_DB_PATH=str(Path(tmp) / "coachscribe.db"),
+            DAILYJOURNAL_SYNC_DIR=str(Path(tmp) / "sync"),
+        )
+
+        results = []
+        for cmd, budget in BUDGETS_MS.items():
+            runs = [measure(cmd, env) for _ in range(args.runs)]
+            best = min(ms for ms, _ in runs)
+            leaked = sorted(set().union(*(mods for _, mods in runs)) & set(FORBIDDEN))
+            limit = budget * args.scale
+            results.append({
+                "command": cmd,
+                "import_ms": round(best, 2),
+                "budget_ms": round(limit, 2),
+                "forbidden_imports": leaked,
+                "ok": best <= limit and not leaked,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            status = "ok  " if r["ok"] else "FAIL"
+            extra = f"  imports {', '.join(r['forbidden_imports'])}" if r["forbidden_imports"] else ""
+            print(f"{status} {r['command']:<10} {r['import_ms']:7.1f} ms (budget {r['budget_ms']:.0f} ms){extra}")
+
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
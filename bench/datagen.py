@@ -0,0 +1,169 @@
+# bench/datagen.py
+"""
+Synthetic journal history for benchmarks.
+
+Fabricates AM/PM/free sessions and append notes, going back day by day from
+today until there are --entries of them, as a sync directory of entry files
+(same names and JSON as entries.export_entry / export_note). With --db, the
+files are also imported into a fresh coachscribe.db through the normal sync.
+
+    python bench/datagen.py --entries 10000 --out /tmp/dj10k
+    python bench/datagen.py --entries 10000 --out /tmp/dj10k --db
+
+Output is deterministic for a given --seed (apart from file name timestamps).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+from dataclasses import asdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from entries import Entry  # noqa: E402
+
+WORDS = (
+    "ticket deploy review meeting phone kids dinner walk park email report budget design "
+    "bug release customer call focus gym stress tired late inbox slack plan sprint demo "
+    "homework soccer garden cook read sleep coffee commute invoice draft outline refactor"
+).split()
+
+# Chance per day of each kind of entry, and max append notes on a day
+P_AM, P_PM, P_FREE, MAX_NOTES = 0.95, 0.85, 0.10, 2
+
+
+def _text(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def _am(rng: random.Random, day: str) -> Dict[str, Any]:
+    answers = [_text(rng, 6, 20) for _ in range(4)]
+    work, family, plan = _text(rng, 4, 10), _text(rng, 4, 10), "If stressed then " + _text(rng, 3, 8)
+    return {
+        "session_date": day,
+        "session_type": "am",
+        "raw_transcript": "\n".join(f"AM Q{i}: {a}" for i, a in enumerate(answers, start=1)),
+        "summary": f"Work One Thing: {work}\nFamily One Thing: {family}\nStress Trigger: {answers[2]}\nIf-Then Plan: {plan}",
+        "work_one_thing": work,
+        "family_one_thing": family,
+        "if_then_plan": plan,
+        "free_text": _text(rng, 10, 60) if rng.random() < 0.3 else None,
+    }
+
+
+def _pm(rng: random.Random, day: str) -> Dict[str, Any]:
+    answers = [_text(rng, 6, 20) for _ in range(4)]
+    cause, improvement, focus = _text(rng, 4, 12), _text(rng, 4, 12), _text(rng, 4, 10)
+    work_done, family_done = int(rng.random() < 0.7), int(rng.random() < 0.6)
+    return {
+        "session_date": day,
+        "session_type": "pm",
+        "raw_transcript": "\n".join(f"PM Q{i}: {a}" for i, a in enumerate(answers, start=1)),
+        "summary": (
+            f"Work Result: {'done' if work_done else 'missed'}\nFamily Result: {'done' if family_done else 'missed'}\n"
+            f"Distraction Cause: {cause}\nImprovement: {improvement}\nTomorrow Focus: {focus}"
+        ),
+        "work_done": work_done,
+        "family_done": family_done,
+        "distraction_cause": cause,
+        "improvement": improvement,
+        "tomorrow_focus": focus,
+        "free_text": _text(rng, 10, 60) if rng.random() < 0.2 else None,
+    }
+
+
+def _free(rng: random.Random, day: str) -> Dict[str, Any]:
+    text = _text(rng, 20, 200)
+    return {
+        "session_date": day,
+        "session_type": "free",
+        "raw_transcript": text,
+        "summary": text[:200] + ("..." if len(text) > 200 else ""),
+        "free_text": text,
+    }
+
+
+def generate(entries: int, seed: int = 0, end: date | None = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (file_name, entry_json) for `entries` sessions and notes, newest day first."""
+    rng = random.Random(seed)
+    day = end or date.today()
+    made = 0
+    while made < entries:
+        iso = day.isoformat()
+        items = []
+        if rng.random() < P_AM:
+            items.append(_am(rng, iso))
+            items.extend({"note": _text(rng, 5, 25)} for _ in range(rng.randint(0, MAX_NOTES)))
+        if rng.random() < P_PM:
+            items.append(_pm(rng, iso))
+        if rng.random() < P_FREE:
+            items.append(_free(rng, iso))
+
+        for item in items[: entries - made]:
+            entry_id = f"{rng.getrandbits(48):012x}"
+            ts = f"{iso.replace('-', '')}T{rng.randint(5, 22):02d}0000Z"
+            if "note" in item:
+                name = f"{iso}_note_{ts}_{entry_id}.json"
+                yield name, {
+                    "entry_kind": "note",
+                    "id": entry_id,
+                    "created_at": f"{iso}T12:00:00Z",
+                    "session_date": iso,
+                    "target_session_type": "am",
+                    "note_text": item["note"],
+                }
+            else:
+                name = f"{iso}_{item['session_type']}_{ts}_{entry_id}.json"
+                yield name, asdict(Entry(id=entry_id, created_at=f"{iso}T12:00:00Z", **item))
+            made += 1
+        day -= timedelta(days=1)
+
+
+def write_sync_dir(sync_dir: Path, entries: int, seed: int = 0) -> int:
+    sync_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for name, data in generate(entries, seed):
+        (sync_dir / name).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        count += 1
+    return count
+
+
+def bench_env(out: Path) -> Dict[str, str]:
+    """Environment that points dailyjournal at out/coachscribe.db and out/sync."""
+    env = dict(os.environ)
+    env.update(
+        HOME=str(out),
+        DAILYJOURNAL_DB_PATH=str(out / "coachscribe.db"),
+        DAILYJOURNAL_SYNC_DIR=str(out / "sync"),
+    )
+    return env
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--entries", type=int, default=1000)
+    ap.add_argument("--out", type=Path, required=True)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--db", action="store_true", help="also import into out/coachscribe.db")
+    args = ap.parse_args(argv)
+
+    count = write_sync_dir(args.out / "sync", args.entries, args.seed)
+    print(f"wrote {count} entry files to {args.out / 'sync'}")
+    if args.db:
+        subprocess.run(
+            [sys.executable, str(ROOT / "app.py"), "sync", "--full"], env=bench_env(args.out), check=True
+        )
+        print(f"imported into {args.out / 'coachscribe.db'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# bench/suite.py
+"""
+Store / entries / sync benchmarks on synthetic history (see datagen.py).
+
+For each scale, a sync dir of that many entries is generated in a temp dir
+and a fresh interpreter times, against it:
+
+    sync_full_ms          first sync into an empty DB (builds the DB for the rest)
+    sync_noop_ms          startup sync with nothing new (best of --runs)
+    sync_incremental_ms   startup sync after one new entry file (best of --runs)
+    show_last_ms          `last` listing, output discarded (best of --runs)
+    am_full_notes_us      get_latest_am_full + get_notes for a random day (mean)
+    export_entry_per_s    export_entry throughput into an empty dir
+
+plus cold_start_last_ms: wall time of `python app.py last` in a new process.
+
+    python bench/suite.py
+    python bench/suite.py --scales 1000,10000 --runs 3 --out bench.json
+    python bench/suite.py --json
+
+Results are JSON (--out / --json) so they can be diffed between commits.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+BENCH = Path(__file__).resolve().parent
+ROOT = BENCH.parent
+sys.path.insert(0, str(BENCH))
+
+from datagen import bench_env, write_sync_dir  # noqa: E402
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+AM_LOOKUPS = 200
+EXPORTS = 500
+
+
+def _ms(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def _best_ms(fn: Callable[[], Any], runs: int) -> float:
+    return min(_ms(fn) for _ in range(runs))
+
+
+def run_child(out: Path, runs: int) -> Dict[str, Any]:
+    """Runs in a fresh interpreter whose env points at out/ (see bench_env)."""
+    import os
+
+    sys.path.insert(0, str(ROOT))
+    import app
+    import entries
+    import store
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    results: Dict[str, Any] = {}
+
+    store.init_db()
+    with quiet:
+        results["sync_full_ms"] = _ms(lambda: app.sync_from_icloud_on_startup(full=True))
+        results["sync_noop_ms"] = _best_ms(app.sync_from_icloud_on_startup, runs)
+
+        def one_new_entry() -> None:
+            entries.export_entry(
+                {"session_date": "2099-01-01", "session_type": "free", "summary": "s", "raw_transcript": "r"}
+            )
+            app.sync_from_icloud_on_startup()
+
+        results["sync_incremental_ms"] = _best_ms(one_new_entry, runs)
+        results["show_last_ms"] = _best_ms(lambda: app.show_last(10), runs)
+
+    with store._conn() as con:
+        days = [r[0] for r in con.execute("SELECT DISTINCT session_date FROM sessions WHERE session_type = 'am'")]
+    rng = random.Random(0)
+    picks = [rng.choice(days) for _ in range(AM_LOOKUPS)] if days else []
+
+    def lookups() -> None:
+        for d in picks:
+            store.get_latest_am_full(d)
+            store.get_notes(d, "am")
+
+    results["am_full_notes_us"] = _ms(lookups) * 1000 / max(1, len(picks))
+
+    os.environ["DAILYJOURNAL_SYNC_DIR"] = str(out / "export_bench")
+    payload = {
+        "session_date": "2025-01-01",
+        "session_type": "pm",
+        "summary": "Work Result: done\nFamily Result: done",
+        "raw_transcript": "PM Q1: " + "x" * 400,
+        "work_done": 1,
+        "family_done": 1,
+    }
+    elapsed = _ms(lambda: [entries.export_entry(payload) for _ in range(EXPORTS)])
+    results["export_entry_per_s"] = EXPORTS / (elapsed / 1000)
+
+    store.close_db()
+    results["db_mb"] = (out / "coachscribe.db").stat().st_size / 1e6
+    return results
+
+
+def run_scale(entries: int, runs: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"djbench{entries}_") as tmp:
+        out = Path(tmp)
+        env = bench_env(out)
+
+        started = time.perf_counter()
+        write_sync_dir(out / "sync", entries)
+        generate_s = time.perf_counter() - started
+
+        proc = subprocess.run(
+            [sys.executable, __file__, "--child", str(out), "--runs", str(runs)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results = json.loads(proc.stdout)
+
+        def cold_start() -> None:
+            subprocess.run(
+                [sys.executable, str(ROOT / "app.py"), "last"],
+                env=env,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                check=True,
+            )
+
+        results["cold_start_last_ms"] = _best_ms(cold_start, runs)
+
+    return {"entries": entries, "generate_s": round(generate_s, 2), **{k: round(v, 2) for k, v in results.items()}}
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--out", type=Path, help="write results JSON here")
+    ap.add_argument("--json", action="store_true", help="print results JSON")
+    ap.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.runs)))
+        return 0
+
+    report = {
+        "meta": {
+            "when": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "results": [],
+    }
+    for entries in (int(s) for s in args.scales.split(",")):
+        result = run_scale(entries, args.runs)
+        report["results"].append(result)
+        if not args.json:
+            print(json.dumps(result))
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,169 @@
 # coach.py
 import json
-from typing import Dict, Any, List
-from openai import OpenAI
+import queue
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from openai import APIConnectionError, APIStatusError, OpenAI
 
+import llm_stats
+from config import load_config
 from prompts import SYSTEM_RULES
 from dj_secrets import get_openai_api_key
+from profiling import span
+
+_client_lock = threading.Lock()
+
 
 def _client() -> OpenAI:
+    # Warm-up and speculative calls run on background threads; build only one
+    with _client_lock:
+        return _make_client()
+
+
+@lru_cache(maxsize=1)
+def _make_client() -> OpenAI:
+    # One client (and one keyring lookup) per process, so the HTTP connection
+    # pool and TLS session are reused across calls
     api_key = get_openai_api_key()
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY not set. Run 'dailyjournal setup'.")
-    return OpenAI(api_key=api_key)
+    # openai_base_url points the client at a proxy or a local fake server (tests)
+    return OpenAI(api_key=api_key, base_url=load_config().openai_base_url or None)
 
-def _ask_llm(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+
+def warm_up(model: str) -> None:
     """
-    Sends a structured request to the OpenAI Responses API and
-    expects a JSON object back.
+    Builds the client and opens the API connection (keyring lookup, TLS
+    handshake) with a cheap request. Meant to run on a background thread while
+    the user is still typing; failures are ignored and left to the real call.
     """
-    client = _client()
-    response = client.responses.create(
+    try:
+        with span("llm warm-up"):
+            _client().models.retrieve(model)
+    except Exception:
+        pass
+
+
+class Speculation:
+    """
+    Starts fn(*args) on a background thread before the user has finished.
+    result(*args) returns the speculative answer if it was made with the same
+    arguments, otherwise (or if it failed) re-issues the call in the foreground.
+    With stream, the speculative call streams its summary into a buffer;
+    result(on_summary=...) replays the buffer and passes the rest on live.
+    Daemon threads, so Ctrl-C never waits on an abandoned request.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args: Any, stream: bool = False):
+        self.fn = fn
+        self.args = args
+        self._done = threading.Event()
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._streamed: List[str] = []
+        self._sink: Optional[Callable[[str], None]] = None
+        kwargs = {"on_summary": self._on_summary} if stream else {}
+        threading.Thread(target=self._run, args=(kwargs,), name="dj-speculate", daemon=True).start()
+
+    def _run(self, kwargs: Dict[str, Any]) -> None:
+        try:
+            self._value = self.fn(*self.args, **kwargs)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def _on_summary(self, text: str) -> None:
+        with self._lock:
+            self._streamed.append(text)
+            if self._sink is not None:
+                self._sink(text)
+
+    def result(self, *args: Any, on_summary: Optional[Callable[[str], None]] = None, **kwargs: Any) -> Any:
+        if args == self.args:
+            if on_summary is not None:
+                with self._lock:
+                    for text in self._streamed:
+                        on_summary(text)
+                    self._sink = on_summary
+            self._done.wait()
+            if self._error is None:
+                return self._value
+            if on_summary is not None and self._streamed:
+                # Part of the summary is already on screen; a new call would repeat it
+                raise self._error
+        return self.fn(*args, on_summary=on_summary, **kwargs)
+
+
+class _SummaryStream:
+    """
+    Incrementally pulls the top-level "summary" string out of a JSON object
+    that is still arriving, passing decoded text to on_text as it comes in.
+    """
+
+    _START = re.compile(r'"summary"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.buf = ""
+        self.pos: Optional[int] = None  # index of the next unread summary char
+        self.done = False
+
+    def feed(self, delta: str) -> None:
+        if self.done:
+            return
+        self.buf += delta
+        if self.pos is None:
+            m = self._START.search(self.buf)
+            if not m:
+                return
+            self.pos = m.end()
+
+        out = []
+        buf, i = self.buf, self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                break
+            if ch == "\\":
+                if i + 1 >= len(buf):
+                    break  # wait for the rest of the escape
+                esc = buf[i + 1]
+                if esc == "u":
+                    if i + 6 > len(buf):
+                        break
+                    code = int(buf[i + 2:i + 6], 16)
+                    if 0xD800 <= code < 0xDC00:
+                        # Surrogate pair: wait for the low half, then combine
+                        if i + 12 > len(buf):
+                            break
+                        low = int(buf[i + 8:i + 12], 16)
+                        code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                        i += 6
+                    out.append(chr(code))
+                    i += 6
+                    continue
+                out.append(self._ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            out.append(ch)
+            i += 1
+
+        self.pos = i
+        if out:
+            self.on_text("".join(out))
+
+
+def build_request(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Responses API request body (also used for async and batch re-summarization)."""
+    return dict(
         model=model,
         input=[
             {
@@ -27,7 +172,7 @@ def _ask_llm(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
             },
             {
                 "role": "user",
-                "content": json.dumps(payload),
+                "content": serialize_payload(payload),
             },
         ],
         text={
@@ -37,52 +182,391 @@ def _ask_llm(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         },
     )
 
-    # Responses API returns text in a few possible places depending on SDK version.
-    # output_text is the safest single accessor.
-    return json.loads(response.output_text)
 
+def _call_llm(
+    model: str,
+    payload: Dict[str, Any],
+    on_summary: Optional[Callable[[str], None]] = None,
+    timeout: Optional[float] = None,
+    info: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    One Responses API call (no SDK retries); returns the raw JSON text of the
+    reply. Token counts reported by the API, and when streaming the
+    perf_counter() time of the first text ("first_byte_at"), go into info.
+    """
+    client = _client().with_options(timeout=timeout, max_retries=0)
+    request = build_request(model, payload)
+
+    if on_summary is None:
+        response = client.responses.create(**request)
+        _store_usage(response, info)
+        # Responses API returns text in a few possible places depending on SDK version.
+        # output_text is the safest single accessor.
+        return response.output_text
+
+    summary = _SummaryStream(on_summary)
+    chunks = []
+    for event in client.responses.create(**request, stream=True):
+        if event.type == "response.output_text.delta":
+            if not chunks and info is not None:
+                info["first_byte_at"] = time.perf_counter()
+            chunks.append(event.delta)
+            summary.feed(event.delta)
+        elif event.type == "response.completed":
+            _store_usage(event.response, info)
+        elif event.type in ("response.failed", "error"):
+            raise RuntimeError(f"OpenAI streaming request failed: {event}")
+    return "".join(chunks)
+
+
+def _store_usage(response: Any, info: Optional[Dict[str, Any]]) -> None:
+    reported = getattr(response, "usage", None)
+    if info is None or reported is None:
+        return
+    info["input_tokens"] = reported.input_tokens
+    info["output_tokens"] = reported.output_tokens
+    details = getattr(reported, "input_tokens_details", None)
+    info["cached_input_tokens"] = getattr(details, "cached_tokens", None)
+
+
+# Status codes worth another attempt: timeouts, conflicts, rate limits, server errors
+_RETRY_STATUS = {408, 409, 429}
+_BACKOFF_BASE_S = 0.5
+_BACKOFF_CAP_S = 8.0
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (APIConnectionError, TimeoutError)):  # APITimeoutError is a subclass
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in _RETRY_STATUS or exc.status_code >= 500
+    return False
+
+
+def _hedged(call: Callable[[], str], hedge_after: float, timeout: float) -> str:
+    """
+    Runs call(); if it hasn't answered within hedge_after seconds, fires an
+    identical second call and returns whichever succeeds first. The loser is
+    abandoned on a daemon thread.
+    """
+    results: "queue.Queue[Tuple[bool, Any]]" = queue.Queue()
 
-def run_am(model: str, answers: List[str]) -> Dict[str, Any]:
+    def run() -> None:
+        try:
+            results.put((True, call()))
+        except BaseException as e:
+            results.put((False, e))
+
+    def launch() -> None:
+        threading.Thread(target=run, name="dj-llm-hedge", daemon=True).start()
+
+    launch()
+    in_flight, hedged = 1, False
+    give_up_at = time.monotonic() + timeout
+    error: Optional[BaseException] = None
+
+    while in_flight:
+        wait = hedge_after if not hedged else give_up_at - time.monotonic()
+        try:
+            ok, value = results.get(timeout=max(0.0, wait))
+        except queue.Empty:
+            if hedged:
+                raise TimeoutError(f"No LLM response within {timeout:.0f}s")
+            launch()
+            in_flight, hedged = in_flight + 1, True
+            continue
+
+        in_flight -= 1
+        if ok:
+            return value
+        error = value
+
+    raise error  # type: ignore[misc]
+
+
+def _call_with_policy(
+    model: str,
+    payload: Dict[str, Any],
+    on_summary: Optional[Callable[[str], None]] = None,
+    info: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    _call_llm under the retry/deadline/hedging policy from config.toml:
+    each attempt is capped at llm_timeout_s, the whole call at llm_deadline_s,
+    and transient failures are retried up to llm_max_retries times with full
+    jitter backoff. With llm_hedge_after_s > 0, non-streamed attempts are hedged.
+    The number of retries goes into info["retries"].
+    """
+    cfg = load_config()
+    info = {} if info is None else info
+    info["retries"] = 0
+    deadline = time.monotonic() + cfg.llm_deadline_s
+
+    # A streamed attempt that already printed part of the summary can't be retried cleanly
+    emitted = [False]
+
+    def tracked(text: str) -> None:
+        emitted[0] = True
+        on_summary(text)  # type: ignore[misc]
+
+    sink = tracked if on_summary is not None else None
+
+    attempt = 0
+    while True:
+        timeout = max(0.1, min(cfg.llm_timeout_s, deadline - time.monotonic()))
+        try:
+            if sink is None and cfg.llm_hedge_after_s > 0:
+                return _hedged(
+                    lambda: _call_llm(model, payload, None, timeout, info), cfg.llm_hedge_after_s, timeout
+                )
+            return _call_llm(model, payload, sink, timeout, info)
+        except Exception as e:
+            if not _is_transient(e) or attempt >= cfg.llm_max_retries or emitted[0]:
+                raise
+            backoff = random.uniform(0, min(_BACKOFF_CAP_S, _BACKOFF_BASE_S * 2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                raise
+            time.sleep(backoff)
+            attempt += 1
+            info["retries"] = attempt
+
+
+def _ask_llm(
+    model: str,
+    payload: Dict[str, Any],
+    on_summary: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Sends a structured request to the OpenAI Responses API and
+    expects a JSON object back.
+    With on_summary, the response is streamed and the "summary" field is passed
+    to on_summary piece by piece as it arrives; the parsed object is still returned.
+    With llm_cache enabled in config.toml, identical requests are answered from
+    the local response cache (see llm_cache.py).
+    Every invocation is recorded - latency, tokens, retries, outcome - in
+    the llm_calls table (see llm_stats.py).
+    """
+    started = time.perf_counter()
+    cfg = load_config()
+    mode = payload["mode"]
+    estimate = estimate_request_tokens(payload)
+
+    cache_key = None
+    if cfg.llm_cache:
+        import llm_cache
+
+        cache_key = llm_cache.cache_key(model, SYSTEM_RULES, payload)
+        cached = llm_cache.get(cache_key, cfg.llm_cache_max_age_days)
+        if cached is not None:
+            data = json.loads(cached)
+            if on_summary and data.get("summary"):
+                on_summary(data["summary"])
+            llm_stats.record_call(mode, model, "cache", started, estimate)
+            return data
+
+    info: Dict[str, Any] = {}
+    try:
+        with span(f"llm {mode}"):
+            text = _call_with_policy(model, payload, on_summary, info)
+        data = json.loads(text)  # only cache replies that parse
+    except Exception as e:
+        llm_stats.record_call(mode, model, "error", started, estimate, info, error=type(e).__name__)
+        raise
+    llm_stats.record_call(mode, model, "ok", started, estimate, info)
+
+    if cache_key is not None:
+        llm_cache.put(cache_key, model, text, cfg.llm_cache_max_mb, cfg.llm_cache_max_age_days)
+    return data
+
+
+# Request payloads: the static per-mode instructions come first so that the
+# prompt prefix (SYSTEM_RULES + spec) is identical across calls and can hit the
+# provider's prompt cache; per-session content follows.
+_AM_SPEC: Dict[str, Any] = {
+    "mode": "am",
+    "instructions": (
+        "Convert the answers into concrete commitments. "
+        "Be strict about specificity. "
+        "Return ONLY the required fields as JSON."
+    ),
+    "summary_rules": "Summary MUST be multi-line, one item per line, using newline characters.",
+    "required_fields": [
+        "work_one_thing",
+        "family_one_thing",
+        "if_then_plan",
+        "summary",
+    ],
+    "summary_format": [
+        "Work One Thing:",
+        "Family One Thing:",
+        "Stress Trigger:",
+        "If-Then Plan:",
+    ],
+}
+
+_PM_SPEC: Dict[str, Any] = {
+    "mode": "pm",
+    "instructions": (
+        "Evaluate whether commitments were met. "
+        "Do not soften failures. "
+        "Return ONLY the required fields as JSON."
+    ),
+    "summary_rules": "Summary MUST be multi-line, one item per line, using newline characters.",
+    "required_fields": [
+        "work_done",
+        "family_done",
+        "distraction_cause",
+        "improvement",
+        "summary",
+        "tomorrow_focus",
+    ],
+    "summary_format": [
+        "Work Result:",
+        "Family Result:",
+        "Distraction Cause:",
+        "Improvement:",
+        "Tomorrow Focus:",
+    ],
+}
+
+# Reviews (see review.py): week digests are the "map" step, period reviews
+# reduce digests (weeks -> month, months -> year)
+_DIGEST_SPEC: Dict[str, Any] = {
+    "mode": "digest",
+    "instructions": (
+        "Digest one week of journal entries for a later monthly or yearly review. "
+        "Keep concrete facts: commitments kept or missed, recurring distractions, improvements tried. "
+        "No advice. Return ONLY the required fields as JSON."
+    ),
+    "summary_rules": "Summary: at most 8 short lines, one item per line, using newline characters.",
+    "required_fields": ["summary"],
+}
+
+_REVIEW_SPEC: Dict[str, Any] = {
+    "mode": "review",
+    "instructions": (
+        "Write a retrospective of the period from the digests of its parts and its stats. "
+        "Name patterns across parts, what worked, what kept failing, and 1-3 concrete adjustments. "
+        "Do not soften failures. Return ONLY the required fields as JSON."
+    ),
+    "summary_rules": "Summary MUST be multi-line, one item per line, using newline characters.",
+    "required_fields": ["summary"],
+    "summary_format": [
+        "Overview:",
+        "Kept:",
+        "Missed:",
+        "Patterns:",
+        "Adjustments:",
+    ],
+}
+
+def digest_week(model: str, week: str, entries: Dict[str, Any]) -> str:
+    """Short digest of one ISO week's sessions and notes."""
+    return _ask_llm(model, build_payload(_DIGEST_SPEC, {"week": week, **entries}))["summary"]
+
+
+def review_period(
+    model: str,
+    period: str,
+    stats: Dict[str, Any],
+    parts: List[Dict[str, str]],
+    on_summary: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Retrospective of period from its parts ({"period", "digest"}) and rollup stats."""
+    payload = build_payload(_REVIEW_SPEC, {"period": period, "stats": stats, "parts": parts})
+    return _ask_llm(model, payload, on_summary)["summary"]
+
+
+# Rough token estimate for budgeting; close enough for English prose
+CHARS_PER_TOKEN = 4
+_TRUNCATED = " …[truncated]"
+
+
+def serialize_payload(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_request_tokens(payload: Dict[str, Any]) -> int:
+    return estimate_tokens(SYSTEM_RULES) + estimate_tokens(serialize_payload(payload))
+
+
+def _truncate_longest(notes: List[str], excess: int) -> List[str]:
+    """Removes at least excess characters by cutting the longest notes down to a common length."""
+    if excess <= 0 or not notes:
+        return notes
+    lengths = sorted((len(n) for n in notes), reverse=True)
+    removed, cap = 0, 0
+    for i, length in enumerate(lengths):
+        below = lengths[i + 1] if i + 1 < len(lengths) else 0
+        # Lowering the i + 1 longest notes from length to below
+        if removed + (length - below) * (i + 1) >= excess:
+            cap = length - -(-(excess - removed) // (i + 1))
+            break
+        removed += (length - below) * (i + 1)
+    return [n if len(n) <= cap else n[:cap] + _TRUNCATED for n in notes]
+
+
+def build_payload(spec: Dict[str, Any], session: Dict[str, Any], budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    spec followed by the per-session fields. If the estimated request exceeds
+    budget tokens (llm_input_token_budget by default), the notes ("am_notes",
+    "append_notes") are truncated, longest first, to fit.
+    """
+    payload = {**spec, **session}
+    budget = load_config().llm_input_token_budget if budget is None else budget
+    excess = (estimate_request_tokens(payload) - budget) * CHARS_PER_TOKEN
+    if budget <= 0 or excess <= 0:
+        return payload
+
+    am_notes = [payload["am_notes"]] if payload.get("am_notes") else []
+    append_notes = list(payload.get("append_notes") or [])
+    notes = am_notes + append_notes
+    notes = _truncate_longest(notes, excess + len(_TRUNCATED) * len(notes))
+    if am_notes:
+        payload["am_notes"] = notes.pop(0)
+    if append_notes:
+        payload["append_notes"] = notes
+    return payload
+
+
+def run_am(
+    model: str,
+    answers: List[str],
+    on_summary: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
     """
     Morning session:
     Takes raw user answers, returns structured commitments + summary.
+    on_summary streams the summary text as it arrives (see _ask_llm).
     """
     transcript = []
     for i, a in enumerate(answers, start=1):
         transcript.append(f"AM Q{i}: {a}")
 
-    payload = {
-        "mode": "am",
-        "answers": answers,
-        "instructions": (
-            "Convert the answers into concrete commitments. "
-            "Be strict about specificity. "
-            "Return ONLY the required fields as JSON."
-        ),
-        "summary_rules": "Summary MUST be multi-line, one item per line, using newline characters.",
-        "required_fields": [
-            "work_one_thing",
-            "family_one_thing",
-            "if_then_plan",
-            "summary",
-        ],
-        "summary_format": [
-            "Work One Thing:",
-            "Family One Thing:",
-            "Stress Trigger:",
-            "If-Then Plan:",
-        ],
-    }
-
-    data = _ask_llm(model, payload)
+    data = _ask_llm(model, am_payload(answers), on_summary)
     data["raw_transcript"] = "\n".join(transcript)
     return data
 
 
-def run_pm(model: str, am_commitments: Dict[str, Any], answers: List[str]) -> Dict[str, Any]:
+def am_payload(answers: List[str]) -> Dict[str, Any]:
+    return build_payload(_AM_SPEC, {"answers": answers})
+
+
+def run_pm(
+    model: str,
+    am_commitments: Dict[str, Any],
+    answers: List[str],
+    on_summary: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
     """
     Evening session:
     Evaluates AM commitments and produces outcomes + tomorrow setup.
+    on_summary streams the summary text as it arrives (see _ask_llm).
     """
     transcript = [
         "AM Commitments:",
@@ -108,34 +592,38 @@ def run_pm(model: str, am_commitments: Dict[str, Any], answers: List[str]) -> Di
     for i, a in enumerate(answers, start=1):
         transcript.append(f"PM Q{i}: {a}")
 
-    payload = {
-        "mode": "pm",
-        "am_commitments": am_commitments,
-        "answers": answers,
-        "instructions": (
-            "Evaluate whether commitments were met. "
-            "Do not soften failures. "
-            "Return ONLY the required fields as JSON."
-        ),
-        "summary_rules": "Summary MUST be multi-line, one item per line, using newline characters.",
-        "required_fields": [
-            "work_done",
-            "family_done",
-            "distraction_cause",
-            "improvement",
-            "summary",
-            "tomorrow_focus",
-        ],
-        "summary_format": [
-            "Work Result:",
-            "Family Result:",
-            "Distraction Cause:",
-            "Improvement:",
-            "Tomorrow Focus:",
-        ],
-    }
-
-    data = _ask_llm(model, payload)
+    data = _ask_llm(model, pm_payload(am_commitments, answers), on_summary)
     data["raw_transcript"] = "\n".join(transcript)
     return data
 
+
+def _am_stress_trigger(am: Dict[str, Any]) -> Optional[str]:
+    # The morning's predicted derail risk (AM Q3) has no field of its own: it is
+    # only in the AM transcript and the summary's "Stress Trigger:" line
+    for text, label in ((am.get("raw_transcript"), "AM Q3:"), (am.get("summary"), "Stress Trigger:")):
+        for line in (text or "").splitlines():
+            line = line.strip().lstrip("- ")
+            if line.startswith(label):
+                return line[len(label):].strip() or None
+    return None
+
+
+def pm_payload(am_commitments: Dict[str, Any], answers: List[str]) -> Dict[str, Any]:
+    # Only what the evaluation needs: the AM summary and raw transcript would
+    # repeat the commitments (their stress trigger is sent on its own), and the
+    # notes are sent once each
+    return build_payload(
+        _PM_SPEC,
+        {
+            "am_commitments": {
+                "work_one_thing": am_commitments.get("work_one_thing"),
+                "family_one_thing": am_commitments.get("family_one_thing"),
+                "if_then_plan": am_commitments.get("if_then_plan"),
+                "stress_trigger": _am_stress_trigger(am_commitments),
+            },
+            "answers": answers,
+            "am_notes": am_commitments.get("free_text") or None,
+            "append_notes": am_commitments.get("append_notes") or [],
+        },
+    )
+
@@ -2,15 +2,16 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 try:
     import tomllib  # Python 3.11+
 except ModuleNotFoundError:  # pragma: no cover
     import tomli as tomllib  # type: ignore
 
+from profiling import span
 
 APP_NAME = "dailyjournal"
 
@@ -44,6 +45,30 @@ class AppConfig:
     db_path: str
     export_dir: str
     model: str = "gpt-4.1-mini"
+    # Show session summaries as they stream in from the LLM
+    stream: bool = True
+    # Warm up the API connection and send the request before optional notes are typed
+    pipeline: bool = True
+    # Opt-in local cache of LLM responses (see llm_cache.py)
+    llm_cache: bool = False
+    llm_cache_max_mb: float = 5.0
+    llm_cache_max_age_days: int = 30
+    # LLM call policy: per-attempt timeout, overall deadline, retries for
+    # transient errors, and hedging (0 = off; else seconds before a duplicate request)
+    llm_timeout_s: float = 30.0
+    llm_deadline_s: float = 60.0
+    llm_max_retries: int = 2
+    llm_hedge_after_s: float = 0.0
+    openai_base_url: str = ""
+    # Estimated input tokens per request; oversized notes are truncated to fit (0 = no limit)
+    llm_input_token_budget: int = 6000
+    # `similar` embeddings: "hash" (local, offline) or "openai" (embedding_model)
+    embedding_backend: str = "hash"
+    embedding_model: str = "text-embedding-3-small"
+    # Entry file writes (see outbox.py): "none", "rename" (temp file + rename) or "fsync"
+    export_durability: str = "rename"
+    # Store long transcripts/summaries zlib-compressed (`dailyjournal compress` converts existing ones)
+    compress_text: bool = False
 
     @staticmethod
     def defaults() -> "AppConfig":
@@ -57,11 +82,34 @@ class AppConfig:
         )
 
 
+# Parsed configs keyed by path; an entry is reused while the file's
+# (mtime_ns, size) signature is unchanged, so the TOML is parsed once per process.
+_config_cache: Dict[Path, Tuple[Optional[Tuple[int, int]], AppConfig]] = {}
+
+
+def _file_signature(cfg_path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = cfg_path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
 def load_config(path: Optional[Path] = None) -> AppConfig:
     cfg_path = path or _default_config_path()
-    if not cfg_path.exists():
-        return AppConfig.defaults()
+    sig = _file_signature(cfg_path)
+
+    cached = _config_cache.get(cfg_path)
+    if cached is not None and cached[0] == sig:
+        return replace(cached[1])
+
+    with span("config"):
+        cfg = _parse_config(cfg_path) if sig is not None else AppConfig.defaults()
+    _config_cache[cfg_path] = (sig, cfg)
+    return replace(cfg)
+
 
+def _parse_config(cfg_path: Path) -> AppConfig:
     data = tomllib.loads(cfg_path.read_text(encoding="utf-8"))
 
     defaults = AppConfig.defaults()
@@ -69,6 +117,21 @@ def load_config(path: Optional[Path] = None) -> AppConfig:
         db_path=str(data.get("db_path", defaults.db_path)),
         export_dir=str(data.get("export_dir", defaults.export_dir)),
         model=str(data.get("model", defaults.model)),
+        stream=bool(data.get("stream", defaults.stream)),
+        pipeline=bool(data.get("pipeline", defaults.pipeline)),
+        llm_cache=bool(data.get("llm_cache", defaults.llm_cache)),
+        llm_cache_max_mb=float(data.get("llm_cache_max_mb", defaults.llm_cache_max_mb)),
+        llm_cache_max_age_days=int(data.get("llm_cache_max_age_days", defaults.llm_cache_max_age_days)),
+        llm_timeout_s=float(data.get("llm_timeout_s", defaults.llm_timeout_s)),
+        llm_deadline_s=float(data.get("llm_deadline_s", defaults.llm_deadline_s)),
+        llm_max_retries=int(data.get("llm_max_retries", defaults.llm_max_retries)),
+        llm_hedge_after_s=float(data.get("llm_hedge_after_s", defaults.llm_hedge_after_s)),
+        openai_base_url=str(data.get("openai_base_url", defaults.openai_base_url)),
+        llm_input_token_budget=int(data.get("llm_input_token_budget", defaults.llm_input_token_budget)),
+        embedding_backend=str(data.get("embedding_backend", defaults.embedding_backend)),
+        embedding_model=str(data.get("embedding_model", defaults.embedding_model)),
+        export_durability=str(data.get("export_durability", defaults.export_durability)),
+        compress_text=bool(data.get("compress_text", defaults.compress_text)),
     )
 
 
@@ -81,8 +144,25 @@ def save_config(cfg: AppConfig, path: Optional[Path] = None) -> Path:
         f'db_path = "{cfg.db_path}"\n'
         f'export_dir = "{cfg.export_dir}"\n'
         f'model = "{cfg.model}"\n'
+        f'stream = {"true" if cfg.stream else "false"}\n'
+        f'pipeline = {"true" if cfg.pipeline else "false"}\n'
+        f'llm_cache = {"true" if cfg.llm_cache else "false"}\n'
+        f'llm_cache_max_mb = {cfg.llm_cache_max_mb}\n'
+        f'llm_cache_max_age_days = {cfg.llm_cache_max_age_days}\n'
+        f'llm_timeout_s = {cfg.llm_timeout_s}\n'
+        f'llm_deadline_s = {cfg.llm_deadline_s}\n'
+        f'llm_max_retries = {cfg.llm_max_retries}\n'
+        f'llm_hedge_after_s = {cfg.llm_hedge_after_s}\n'
+        f'openai_base_url = "{cfg.openai_base_url}"\n'
+        f'llm_input_token_budget = {cfg.llm_input_token_budget}\n'
+        f'embedding_backend = "{cfg.embedding_backend}"\n'
+        f'embedding_model = "{cfg.embedding_model}"\n'
+        f'export_durability = "{cfg.export_durability}"\n'
+        f'compress_text = {"true" if cfg.compress_text else "false"}\n'
     )
     cfg_path.write_text(content, encoding="utf-8")
+    # Same-size rewrites within the mtime granularity would look unchanged
+    _config_cache.pop(cfg_path, None)
     return cfg_path
 
 
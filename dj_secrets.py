@@ -6,6 +6,8 @@ from typing import Optional
 
 import keyring
 
+from profiling import span
+
 SERVICE_NAME = "dailyjournal"
 KEY_NAME = "openai_api_key"
 
@@ -17,7 +19,8 @@ def get_openai_api_key() -> Optional[str]:
         return env.strip()
 
     try:
-        val = keyring.get_password(SERVICE_NAME, KEY_NAME)
+        with span("keyring"):
+            val = keyring.get_password(SERVICE_NAME, KEY_NAME)
         return val.strip() if val else None
     except Exception:
         return None
@@ -1,12 +1,19 @@
 # entries.py
+import gzip
 import json
 import os
+import sys
+from collections import deque
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional, Set, Tuple
 from uuid import uuid4
 
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
 
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -18,6 +25,11 @@ def _safe_sync_dir() -> Optional[Path]:
         from config import load_config
         export_dir = load_config().export_dir
 
+    return _prepare_sync_dir(export_dir)
+
+@lru_cache(maxsize=None)
+def _prepare_sync_dir(export_dir: str) -> Path:
+    # Resolved and created once per process for each configured location
     p = Path(export_dir).expanduser()
     p.mkdir(parents=True, exist_ok=True)
     return p
@@ -52,16 +64,12 @@ class Entry:
     free_text: Optional[str] = None
 
 
-def export_entry(payload: Dict[str, Any]) -> Optional[Path]:
+def entry_file(payload: Dict[str, Any]) -> Tuple[str, str]:
     """
-    Writes one immutable JSON entry file into DAILYJOURNAL_SYNC_DIR.
-    Returns the file path if written, otherwise None.
+    File name and JSON text of the entry file for a session payload.
+    The file's id is payload["entry_id"] (set by store.insert_session) when present.
     """
-    sync_dir = _safe_sync_dir()
-    if sync_dir is None:
-        return None
-
-    entry_id = uuid4().hex[:12]
+    entry_id = payload.get("entry_id") or uuid4().hex[:12]
     entry = Entry(
         id=entry_id,
         session_date=payload["session_date"],
@@ -81,25 +89,126 @@ def export_entry(payload: Dict[str, Any]) -> Optional[Path]:
         tomorrow_focus=payload.get("tomorrow_focus"),
         free_text=payload.get("free_text"),
     )
+    name = _make_filename(entry.session_date, entry.session_type, entry.id)
+    return name, json.dumps(asdict(entry), ensure_ascii=False, indent=2)
 
-    file_path = sync_dir / _make_filename(entry.session_date, entry.session_type, entry.id)
 
-    # Write atomically: write temp then rename
+EXPORT_DURABILITY = ("none", "rename", "fsync")
+
+
+def _fsync_dir(path: Path) -> None:
+    if os.name == "nt":
+        return  # directories can't be opened for fsync on Windows
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # some network filesystems refuse directory fsync
+    finally:
+        os.close(fd)
+
+
+def write_entry_file(sync_dir: Path, name: str, text: str, durability: str = "rename") -> Path:
+    """
+    Writes an entry file. Rewriting the same name with the same text is harmless.
+    durability: "none" writes in place, "rename" writes a temp file and renames
+    it over, "fsync" also fsyncs the file and the directory.
+    """
+    if durability not in EXPORT_DURABILITY:
+        raise ValueError(f"Unknown export_durability {durability!r} (choose from {', '.join(EXPORT_DURABILITY)})")
+    file_path = sync_dir / name
+    data = text.encode("utf-8")
+    if durability == "none":
+        file_path.write_bytes(data)
+        return file_path
+
     tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
-    tmp_path.write_text(json.dumps(asdict(entry), ensure_ascii=False, indent=2), encoding="utf-8")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        if durability == "fsync":
+            f.flush()
+            os.fsync(f.fileno())
     tmp_path.replace(file_path)
-
+    if durability == "fsync":
+        _fsync_dir(sync_dir)
     return file_path
 
-def iter_entry_files() -> list[Path]:
+
+def export_entry(payload: Dict[str, Any]) -> Optional[Path]:
+    """
+    Writes one immutable JSON entry file into DAILYJOURNAL_SYNC_DIR right away
+    (sessions saved through store.insert_session(export=True) go via outbox.py).
+    Returns the file path if written, otherwise None.
+    """
+    sync_dir = _safe_sync_dir()
+    if sync_dir is None:
+        return None
+
+    name, text = entry_file(payload)
+    # Write atomically: write temp then rename
+    return write_entry_file(sync_dir, name, text)
+
+def scan_entry_names() -> Iterator[str]:
+    """Yields entry file names straight from os.scandir (unsorted, no stat or parse)."""
+    sync_dir = _safe_sync_dir()
+    if sync_dir is None:
+        return
+
+    with os.scandir(sync_dir) as it:
+        for e in it:
+            if e.name.endswith(".json") and e.is_file():
+                yield e.name
+
+def iter_entry_files(skip: Optional[Set[str]] = None) -> list[Path]:
+    """Entry files in the sync dir whose names aren't in skip, sorted by name."""
     sync_dir = _safe_sync_dir()
     if sync_dir is None:
         return []
-    return sorted([p for p in sync_dir.glob("*.json") if p.is_file()])
+    return [sync_dir / n for n in sorted(n for n in scan_entry_names() if not skip or n not in skip)]
+
+def sync_dir_mtime_ns() -> Optional[int]:
+    sync_dir = _safe_sync_dir()
+    if sync_dir is None:
+        return None
+    return sync_dir.stat().st_mtime_ns
 
 def read_entry_file(path: Path) -> dict[str, Any]:
     return json.loads(path.read_text(encoding="utf-8"))
 
+# Reads on cloud-backed folders can stall on placeholder downloads, so files are
+# fetched on a small pool. MAX_PENDING bounds how many parsed entries can sit in
+# memory waiting for the consumer.
+READ_WORKERS = 8
+MAX_PENDING = 64
+
+def iter_parsed_entries(
+    paths: Iterable[Path],
+    workers: int = READ_WORKERS,
+    max_pending: int = MAX_PENDING,
+) -> Iterator[Tuple[str, Optional[dict[str, Any]], Optional[Exception]]]:
+    """
+    Reads and parses entry files concurrently, yielding (name, entry, error)
+    in the same order as paths. Exactly one of entry/error is set.
+    At most max_pending files are in flight at a time.
+    """
+    # Only sync needs the pool; keep concurrent.futures off the cold-start path
+    from concurrent.futures import ThreadPoolExecutor
+
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dj-read") as pool:
+        for path in paths:
+            pending.append((path.name, pool.submit(read_entry_file, path)))
+            if len(pending) >= max_pending:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+def _result(name: str, fut: "Future") -> Tuple[str, Optional[dict[str, Any]], Optional[Exception]]:
+    try:
+        return name, fut.result(), None
+    except Exception as e:
+        return name, None, e
+
 def wipe_sync_dir_entries() -> int:
     """
     Deletes all files in DAILYJOURNAL_SYNC_DIR.
@@ -117,19 +226,12 @@ def wipe_sync_dir_entries() -> int:
 
     return deleted
 
-def export_note(session_date: str, target_session_type: str, note_text: str) -> Optional[Path]:
-    """
-    Writes an append-note JSON file to DAILYJOURNAL_SYNC_DIR.
-    Notes are separate files (append-only) so they sync across machines.
-    """
-    sync_dir = _safe_sync_dir()
-    if sync_dir is None:
-        return None
-
-    entry_id = uuid4().hex[:12]
+def note_file(
+    session_date: str, target_session_type: str, note_text: str, entry_id: Optional[str] = None
+) -> Tuple[str, str]:
+    """File name and JSON text of an append-note file; entry_id should be the note row's."""
+    entry_id = entry_id or uuid4().hex[:12]
     ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-    file_path = sync_dir / f"{session_date}_note_{ts}_{entry_id}.json"
-
     payload = {
         "entry_kind": "note",
         "id": entry_id,
@@ -138,9 +240,46 @@ def export_note(session_date: str, target_session_type: str, note_text: str) ->
         "target_session_type": target_session_type, # "am" (for now)
         "note_text": note_text,
     }
+    return f"{session_date}_note_{ts}_{entry_id}.json", json.dumps(payload, ensure_ascii=False, indent=2)
 
-    tmp_path = file_path.with_suffix(file_path.suffix + ".tmp")
-    tmp_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp_path.replace(file_path)
-    return file_path
 
+def export_note(
+    session_date: str, target_session_type: str, note_text: str, entry_id: Optional[str] = None
+) -> Optional[Path]:
+    """
+    Writes an append-note JSON file to DAILYJOURNAL_SYNC_DIR right away.
+    Notes are separate files (append-only) so they sync across machines.
+    """
+    sync_dir = _safe_sync_dir()
+    if sync_dir is None:
+        return None
+
+    name, text = note_file(session_date, target_session_type, note_text, entry_id)
+    return write_entry_file(sync_dir, name, text)
+
+
+def write_jsonl(rows: Iterable[Dict[str, Any]], out_path: Optional[Path] = None, compress: bool = False) -> int:
+    """
+    Writes rows as compact JSON lines to out_path (stdout if None), gzip-compressed
+    if requested. Rows are written as they arrive. Returns the number of rows.
+    """
+    if out_path is None:
+        out = sys.stdout
+        close = False
+    elif compress:
+        out = gzip.open(out_path, "wt", encoding="utf-8")
+        close = True
+    else:
+        out = open(out_path, "w", encoding="utf-8")
+        close = True
+
+    count = 0
+    try:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            out.write("\n")
+            count += 1
+    finally:
+        if close:
+            out.close()
+    return count
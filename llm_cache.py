@@ -0,0 +1,99 @@
+# llm_cache.py
+"""
+Opt-in, content-addressed cache for LLM responses (llm_cache = true in config.toml).
+
+Entries are keyed by a SHA-256 of the model, SYSTEM_RULES and the serialized
+payload, and live in the journal DB (llm_cache table). Least recently used
+entries are evicted once the cache exceeds llm_cache_max_mb, and entries older
+than llm_cache_max_age_days are never served. Hit/miss counters persist across
+runs so the savings are visible with `dailyjournal cache`.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from store import _conn
+
+
+def cache_key(model: str, system: str, payload: Dict[str, Any]) -> str:
+    blob = json.dumps({"model": model, "system": system, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds")
+
+
+def _bump(con, counter: str) -> None:
+    con.execute(
+        "INSERT INTO llm_cache_stats (name, value) VALUES (?, 1) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+        (counter,),
+    )
+
+
+def get(key: str, max_age_days: int) -> Optional[str]:
+    """The cached response text for key, or None. Counts a hit or a miss."""
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    with _conn() as con:
+        row = con.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?",
+            (key, cutoff),
+        ).fetchone()
+        if row:
+            con.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (_now(), key))
+            _bump(con, "hits")
+            return row[0]
+        _bump(con, "misses")
+        return None
+
+
+def put(key: str, model: str, response: str, max_mb: float, max_age_days: int) -> None:
+    now = _now()
+    cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    with _conn() as con:
+        con.execute(
+            """
+            INSERT INTO llm_cache (key, model, response, size, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                response = excluded.response, size = excluded.size,
+                created_at = excluded.created_at, last_used_at = excluded.last_used_at
+            """,
+            (key, model, response, len(response.encode("utf-8")), now, now),
+        )
+        con.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+        # LRU eviction down to the size budget
+        con.execute(
+            """
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC, key) AS running
+                    FROM llm_cache
+                ) WHERE running > ?
+            )
+            """,
+            (int(max_mb * 1024 * 1024),),
+        )
+
+
+def stats() -> Dict[str, Any]:
+    with _conn() as con:
+        counters = dict(con.execute("SELECT name, value FROM llm_cache_stats").fetchall())
+        entries, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+    hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+    return {
+        "entries": entries,
+        "bytes": size,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else None,
+    }
+
+
+def clear() -> int:
+    with _conn() as con:
+        removed = con.execute("DELETE FROM llm_cache").rowcount
+        con.execute("DELETE FROM llm_cache_stats")
+    return removed
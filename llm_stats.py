@@ -0,0 +1,162 @@
+# llm_stats.py
+"""
+Per-call LLM telemetry (llm_calls table): for every _ask_llm invocation the
+model, session type, latency (and time to first text when streaming), the
+estimated and reported token counts, retries and the outcome (ok / error /
+cache). `dailyjournal stats --llm` reports tokens per session type and
+latency percentiles and error rates per model.
+
+Calls are buffered in memory and written in one transaction at exit (or
+before a report), so recording never touches the DB during a session.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from store import _conn
+
+_pending: List[tuple] = []
+_pending_lock = threading.Lock()
+
+
+def record_call(
+    mode: str,
+    model: str,
+    outcome: str,
+    started: float,
+    estimated_input_tokens: int,
+    info: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Buffers one call; started is the time.perf_counter() at which it began."""
+    now = time.perf_counter()
+    info = info or {}
+    first_byte_at = info.get("first_byte_at")
+    row = (
+        datetime.utcnow().isoformat(timespec="seconds"),
+        mode,
+        model,
+        outcome,
+        error,
+        (now - started) * 1000,
+        (first_byte_at - started) * 1000 if first_byte_at else None,
+        info.get("retries", 0),
+        estimated_input_tokens,
+        info.get("input_tokens"),
+        info.get("cached_input_tokens"),
+        info.get("output_tokens"),
+    )
+    with _pending_lock:
+        _pending.append(row)
+
+
+def flush() -> None:
+    with _pending_lock:
+        rows = _pending[:]
+        del _pending[:]
+    if not rows:
+        return
+    with _conn() as con:
+        con.executemany(
+            """
+            INSERT INTO llm_calls
+                (called_at, mode, model, outcome, error, latency_ms, ttfb_ms, retries,
+                 estimated_input_tokens, input_tokens, cached_input_tokens, output_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+
+
+# Registered after store's close_db (imported above), so it runs before it
+atexit.register(flush)
+
+
+def _since(days: int) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).isoformat(timespec="seconds")
+
+
+def usage_by_mode(days: int = 30) -> List[Dict[str, Any]]:
+    """API call count and token totals per session type over the last days days."""
+    flush()
+    with _conn() as con:
+        rows = con.execute(
+            """
+            SELECT mode, COUNT(*), SUM(estimated_input_tokens), SUM(input_tokens),
+                   SUM(cached_input_tokens), SUM(output_tokens)
+            FROM llm_calls
+            WHERE called_at >= ? AND outcome != 'cache'
+            GROUP BY mode
+            ORDER BY mode
+            """,
+            (_since(days),),
+        ).fetchall()
+    return [
+        {
+            "mode": r[0],
+            "calls": r[1],
+            "estimated_input_tokens": r[2] or 0,
+            "input_tokens": r[3] or 0,
+            "cached_input_tokens": r[4] or 0,
+            "output_tokens": r[5] or 0,
+        }
+        for r in rows
+    ]
+
+
+def _percentile(ordered: List[float], p: float) -> Optional[float]:
+    # Nearest-rank
+    if not ordered:
+        return None
+    return ordered[max(0, int(-(-len(ordered) * p // 100)) - 1)]
+
+
+def latency_by_model(days: int = 30) -> List[Dict[str, Any]]:
+    """Latency percentiles, error rate and retries per model over the last days days."""
+    flush()
+    per_model: Dict[str, Dict[str, Any]] = {}
+    with _conn() as con:
+        cur = con.execute(
+            """
+            SELECT model, outcome, latency_ms, ttfb_ms, retries
+            FROM llm_calls
+            WHERE called_at >= ?
+            ORDER BY model
+            """,
+            (_since(days),),
+        )
+        for model, outcome, latency, ttfb, retries in cur:
+            m = per_model.setdefault(
+                model, {"latencies": [], "ttfbs": [], "errors": 0, "cache_hits": 0, "retries": 0}
+            )
+            if outcome == "cache":
+                m["cache_hits"] += 1
+                continue
+            if outcome == "error":
+                m["errors"] += 1
+            if latency is not None:
+                m["latencies"].append(latency)
+            if ttfb is not None:
+                m["ttfbs"].append(ttfb)
+            m["retries"] += retries or 0
+
+    report = []
+    for model, m in per_model.items():
+        latencies, ttfbs = sorted(m["latencies"]), sorted(m["ttfbs"])
+        calls = len(latencies)
+        report.append(
+            {
+                "model": model,
+                "calls": calls,
+                "cache_hits": m["cache_hits"],
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99),
+                "ttfb_p50_ms": _percentile(ttfbs, 50),
+                "error_rate": m["errors"] / calls if calls else None,
+                "retries": m["retries"],
+            }
+        )
+    return report
@@ -0,0 +1,459 @@
+# migrations.py
+"""
+Versioned schema migrations, tracked with PRAGMA user_version.
+
+MIGRATIONS[i] upgrades a DB from version i to i + 1. Each one runs in its own
+transaction together with the user_version bump, so a failed migration leaves
+the DB at the previous version. Append new migrations to the end; never edit
+or reorder ones that have shipped.
+
+Migrations should be idempotent where they can (IF NOT EXISTS, add_columns,
+ensure_index) so DBs created before versioning existed migrate in place.
+"""
+import sqlite3
+import sys
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def add_columns(con: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    """Adds each missing column, e.g. {"entry_id": "TEXT"}. Existing columns are left alone."""
+    existing = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def ensure_index(
+    con: sqlite3.Connection,
+    name: str,
+    table: str,
+    columns: Sequence[str],
+    unique: bool = False,
+    where: Optional[str] = None,
+) -> None:
+    con.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+        f"ON {table}({', '.join(columns)})"
+        + (f" WHERE {where}" if where else "")
+    )
+
+
+def _m001_base_schema(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_date TEXT NOT NULL,          -- YYYY-MM-DD
+            session_type TEXT NOT NULL,          -- 'am' or 'pm'
+            raw_transcript TEXT NOT NULL,
+            summary TEXT NOT NULL,
+
+            -- AM commitments
+            work_one_thing TEXT,
+            family_one_thing TEXT,
+            if_then_plan TEXT,
+
+            -- PM outcomes
+            work_done INTEGER,                   -- 0/1
+            family_done INTEGER,                 -- 0/1
+            distraction_cause TEXT,
+            improvement TEXT,
+            tomorrow_focus TEXT,
+
+            free_text TEXT,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_date TEXT NOT NULL,         -- YYYY-MM-DD
+            target_session_type TEXT NOT NULL,  -- "am"
+            note_text TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    ensure_index(con, "idx_notes_date_type", "notes", ["session_date", "target_session_type"])
+    ensure_index(con, "idx_sessions_date_type", "sessions", ["session_date", "session_type"])
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS imported_files (
+            file_name TEXT PRIMARY KEY,
+            imported_at TEXT NOT NULL
+        )
+        """
+    )
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m002_full_text_search(con: sqlite3.Connection) -> None:
+    # FTS5 tables keep their own copy of the text (rowid = sessions.id / notes.id)
+    # and are kept in sync by triggers, so every write path is covered.
+    con.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS sessions_fts USING fts5(
+            summary, raw_transcript, free_text, distraction_cause,
+            tokenize = 'porter unicode61'
+        )
+        """
+    )
+    con.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            note_text,
+            tokenize = 'porter unicode61'
+        )
+        """
+    )
+
+    # One execute per trigger: executescript() would commit the migration's transaction
+    triggers = [
+        """
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_ai AFTER INSERT ON sessions BEGIN
+            INSERT INTO sessions_fts (rowid, summary, raw_transcript, free_text, distraction_cause)
+            VALUES (new.id, new.summary, new.raw_transcript, new.free_text, new.distraction_cause);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_ad AFTER DELETE ON sessions BEGIN
+            DELETE FROM sessions_fts WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS sessions_fts_au
+        AFTER UPDATE OF summary, raw_transcript, free_text, distraction_cause ON sessions BEGIN
+            DELETE FROM sessions_fts WHERE rowid = old.id;
+            INSERT INTO sessions_fts (rowid, summary, raw_transcript, free_text, distraction_cause)
+            VALUES (new.id, new.summary, new.raw_transcript, new.free_text, new.distraction_cause);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, note_text) VALUES (new.id, new.note_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM notes_fts WHERE rowid = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF note_text ON notes BEGIN
+            DELETE FROM notes_fts WHERE rowid = old.id;
+            INSERT INTO notes_fts (rowid, note_text) VALUES (new.id, new.note_text);
+        END
+        """,
+    ]
+    for ddl in triggers:
+        con.execute(ddl)
+
+    # Index existing history
+    con.execute("DELETE FROM sessions_fts")
+    con.execute(
+        """
+        INSERT INTO sessions_fts (rowid, summary, raw_transcript, free_text, distraction_cause)
+        SELECT id, summary, raw_transcript, free_text, distraction_cause FROM sessions
+        """
+    )
+    con.execute("DELETE FROM notes_fts")
+    con.execute("INSERT INTO notes_fts (rowid, note_text) SELECT id, note_text FROM notes")
+
+
+def _m003_rollups(con: sqlite3.Connection) -> None:
+    import rollups
+
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rollups (
+            grain TEXT NOT NULL,                 -- day/week/month/year
+            period TEXT NOT NULL,                -- 2025-01-06 / 2025-W02 / 2025-01 / 2025
+            am_count INTEGER NOT NULL DEFAULT 0,
+            pm_count INTEGER NOT NULL DEFAULT 0,
+            free_count INTEGER NOT NULL DEFAULT 0,
+            work_done INTEGER NOT NULL DEFAULT 0,
+            family_done INTEGER NOT NULL DEFAULT 0,
+            gap_days INTEGER NOT NULL DEFAULT 0, -- days with an AM but no PM
+            PRIMARY KEY (grain, period)
+        ) WITHOUT ROWID
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS streak_runs (
+            kind TEXT NOT NULL,                  -- journal/work/family
+            day TEXT NOT NULL,
+            run_start TEXT NOT NULL,             -- accurate on the run's last day
+            run_end TEXT NOT NULL,               -- accurate on the run's first day
+            PRIMARY KEY (kind, day)
+        ) WITHOUT ROWID
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS streak_best (
+            kind TEXT PRIMARY KEY,
+            length INTEGER NOT NULL,
+            run_start TEXT NOT NULL,
+            run_end TEXT NOT NULL
+        )
+        """
+    )
+    rollups.rebuild(con)
+
+
+def _m004_history_headlines(con: sqlite3.Connection) -> None:
+    add_columns(con, "sessions", {"summary_headline": "TEXT"})
+    con.execute(
+        """
+        UPDATE sessions SET summary_headline = rtrim(
+            CASE WHEN instr(summary, char(10)) > 0
+                 THEN substr(summary, 1, instr(summary, char(10)) - 1)
+                 ELSE summary END,
+            char(13))
+        """
+    )
+    # Covers `last`/`history`: keyset order plus every listed column
+    ensure_index(con, "idx_sessions_history", "sessions", ["session_date", "id", "session_type", "summary_headline"])
+
+
+def _m005_llm_cache(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,                -- sha256(model, system rules, payload)
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,               -- bytes
+            created_at TEXT NOT NULL,
+            last_used_at TEXT NOT NULL
+        )
+        """
+    )
+    ensure_index(con, "idx_llm_cache_last_used", "llm_cache", ["last_used_at"])
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache_stats (
+            name TEXT PRIMARY KEY,               -- hits / misses
+            value INTEGER NOT NULL
+        )
+        """
+    )
+
+
+def _m006_llm_calls(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            called_at TEXT NOT NULL,             -- UTC
+            mode TEXT NOT NULL,                  -- am / pm
+            model TEXT NOT NULL,
+            estimated_input_tokens INTEGER NOT NULL,
+            input_tokens INTEGER,                -- as reported by the API
+            cached_input_tokens INTEGER,
+            output_tokens INTEGER
+        )
+        """
+    )
+    ensure_index(con, "idx_llm_calls_called_at", "llm_calls", ["called_at"])
+
+
+def _m007_llm_call_telemetry(con: sqlite3.Connection) -> None:
+    add_columns(
+        con,
+        "llm_calls",
+        {
+            "outcome": "TEXT NOT NULL DEFAULT 'ok'",  # ok / error / cache
+            "error": "TEXT",                          # exception type for errors
+            "latency_ms": "REAL",
+            "ttfb_ms": "REAL",                        # streamed calls: time to first text
+            "retries": "INTEGER NOT NULL DEFAULT 0",
+        },
+    )
+
+
+def _m008_resummarize_progress(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resummarize_progress (
+            job_key TEXT NOT NULL,               -- hash of model + SYSTEM_RULES
+            session_id INTEGER NOT NULL,
+            done_at TEXT NOT NULL,
+            PRIMARY KEY (job_key, session_id)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def _m009_review_digests(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS review_digests (
+            period TEXT PRIMARY KEY,             -- 2025-W02 / 2025-01 / 2025
+            grain TEXT NOT NULL,                 -- week/month/year
+            content_hash TEXT NOT NULL,          -- sha256 of the inputs, model and prompts
+            model TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m010_vector_index(con: sqlite3.Connection) -> None:
+    # The vectors themselves live in <db>.vectors (see vectors.py)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vector_rows (
+            row INTEGER PRIMARY KEY,             -- row number in the vector file
+            session_id INTEGER NOT NULL UNIQUE
+        )
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vector_meta (
+            key TEXT PRIMARY KEY,                -- backend / dim
+            value TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m011_entry_ids(con: sqlite3.Connection) -> None:
+    import rollups
+    from store import (
+        LEGACY_MATCH_SECONDS, _NOTE_HASH_FIELDS, _SESSION_HASH_FIELDS, note_content_hash, session_content_hash,
+    )
+
+    # Existing rows get a content hash (their entry ids were never stored), then
+    # rows imported back from their own export file are collapsed onto the
+    # original: same content, created moments apart, one local and one imported
+    # (see LEGACY_MATCH_SECONDS). Identical entries made at different times, or
+    # both typed locally, are kept.
+    removed = 0
+    for table, fields, content_hash in (
+        ("sessions", _SESSION_HASH_FIELDS, session_content_hash),
+        ("notes", _NOTE_HASH_FIELDS, note_content_hash),
+    ):
+        add_columns(con, table, {"entry_id": "TEXT", "content_hash": "TEXT"})
+        rows = con.execute(f"SELECT id, {', '.join(fields)} FROM {table}").fetchall()
+        con.executemany(
+            f"UPDATE {table} SET content_hash = ? WHERE id = ?",
+            [(content_hash(dict(zip(fields, row[1:]))), row[0]) for row in rows],
+        )
+        ensure_index(con, f"idx_{table}_entry_id", table, ["entry_id"], unique=True, where="entry_id IS NOT NULL")
+        ensure_index(con, f"idx_{table}_content_hash", table, ["content_hash"])
+        removed += con.execute(
+            f"""
+            DELETE FROM {table} WHERE EXISTS (
+                SELECT 1 FROM {table} o
+                WHERE o.content_hash = {table}.content_hash AND o.id < {table}.id
+                  AND (o.created_at LIKE '%Z') != ({table}.created_at LIKE '%Z')
+                  AND abs(julianday(rtrim(o.created_at, 'Z')) - julianday(rtrim({table}.created_at, 'Z'))) * 86400
+                      <= {LEGACY_MATCH_SECONDS}
+            )
+            """
+        ).rowcount
+    if removed:
+        rollups.rebuild(con)
+        print(f"(db) Removed {removed} duplicate entr{'y' if removed == 1 else 'ies'}.", file=sys.stderr)
+
+
+def _m012_export_outbox(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS export_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_name TEXT NOT NULL UNIQUE,
+            body TEXT NOT NULL,                  -- the file's contents
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m013_compressed_text(con: sqlite3.Connection) -> None:
+    # Session text columns may now hold compressed BLOBs (store.pack_text). The
+    # triggers index only plain TEXT values, so the schema needs no app-defined
+    # functions; store writes the text of compressed values into sessions_fts.
+    con.execute("DROP TRIGGER IF EXISTS sessions_fts_ai")
+    con.execute("DROP TRIGGER IF EXISTS sessions_fts_au")
+    plain = ", ".join(
+        f"CASE WHEN typeof(new.{col}) = 'blob' THEN NULL ELSE new.{col} END"
+        for col in ("summary", "raw_transcript", "free_text")
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER sessions_fts_ai AFTER INSERT ON sessions BEGIN
+            INSERT INTO sessions_fts (rowid, summary, raw_transcript, free_text, distraction_cause)
+            VALUES (new.id, {plain}, new.distraction_cause);
+        END
+        """
+    )
+    con.execute(
+        f"""
+        CREATE TRIGGER sessions_fts_au
+        AFTER UPDATE OF summary, raw_transcript, free_text, distraction_cause ON sessions BEGIN
+            DELETE FROM sessions_fts WHERE rowid = old.id;
+            INSERT INTO sessions_fts (rowid, summary, raw_transcript, free_text, distraction_cause)
+            VALUES (new.id, {plain}, new.distraction_cause);
+        END
+        """
+    )
+
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _m001_base_schema,
+    _m002_full_text_search,
+    _m003_rollups,
+    _m004_history_headlines,
+    _m005_llm_cache,
+    _m006_llm_calls,
+    _m007_llm_call_telemetry,
+    _m008_resummarize_progress,
+    _m009_review_digests,
+    _m010_vector_index,
+    _m011_entry_ids,
+    _m012_export_outbox,
+    _m013_compressed_text,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """Applies pending migrations and returns the resulting schema version."""
+    version = con.execute("PRAGMA user_version").fetchone()[0]
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema v{version} is newer than this dailyjournal (v{SCHEMA_VERSION}). Upgrade dailyjournal."
+        )
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        # Explicit BEGIN: sqlite3 would otherwise autocommit each DDL statement
+        con.execute("BEGIN")
+        try:
+            MIGRATIONS[target - 1](con)
+            con.execute(f"PRAGMA user_version = {target}")
+        except Exception:
+            con.rollback()
+            raise
+        con.commit()
+
+    return SCHEMA_VERSION
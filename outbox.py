@@ -0,0 +1,119 @@
+# outbox.py
+"""
+Write-behind export of entry files to the sync dir.
+
+store.insert_session / add_note (export=True) record each entry file in
+export_outbox in the same transaction as the session or note itself, and
+mark it imported so this machine never reads it back. flush() writes the
+pending files and only then deletes their rows. A crash before the delete
+just rewrites the same file, under the same name, on the next flush - an
+export is never lost, and never written twice under different names.
+
+Saving a session starts a background flush, so a slow (network-mounted) sync
+dir doesn't hold up the session. Whatever is left is flushed at exit, and
+leftovers from a crashed run on the next start (resume).
+
+How hard each write tries to survive a crash is export_durability in
+config.toml:
+
+    none     write the file in place (a crash can leave a partial file until
+             the next flush rewrites it)
+    rename   write a temp file and rename it over the name (default)
+    fsync    rename, and fsync the file and the directory before the row
+             is deleted
+"""
+import atexit
+import sys
+import threading
+from pathlib import Path
+from typing import List
+
+from config import load_config
+from entries import _safe_sync_dir, write_entry_file
+from store import _conn
+
+FLUSH_BATCH = 100
+
+_lock = threading.Lock()
+_at_exit = False
+
+
+def pending() -> int:
+    with _conn() as con:
+        return con.execute("SELECT COUNT(*) FROM export_outbox").fetchone()[0]
+
+
+def flush() -> int:
+    """Writes pending entry files, oldest first. Returns how many were written."""
+    with _lock:
+        written = 0
+        sync_dir = None
+        durability = ""
+        mtime_before = 0
+        try:
+            while True:
+                with _conn() as con:
+                    rows = con.execute(
+                        "SELECT id, file_name, body FROM export_outbox ORDER BY id LIMIT ?", (FLUSH_BATCH,)
+                    ).fetchall()
+                if not rows:
+                    return written
+                if sync_dir is None:
+                    sync_dir = _safe_sync_dir()
+                    durability = load_config().export_durability
+                    if sync_dir is None:
+                        return written
+                    mtime_before = sync_dir.stat().st_mtime_ns
+
+                done: List[int] = []
+                error = None
+                for row_id, name, body in rows:
+                    try:
+                        write_entry_file(sync_dir, name, body, durability)
+                    except (OSError, ValueError) as e:
+                        error = e
+                        break
+                    done.append(row_id)
+                with _conn() as con:
+                    con.executemany("DELETE FROM export_outbox WHERE id = ?", [(i,) for i in done])
+                written += len(done)
+                if error is not None:
+                    print(
+                        f"(cloud) WARNING: could not write entry files, will retry next run: {error}",
+                        file=sys.stderr,
+                    )
+                    return written
+        finally:
+            if written:
+                _skip_own_writes(sync_dir, mtime_before)
+
+
+def _skip_own_writes(sync_dir: Path, mtime_before: int) -> None:
+    # Startup sync skips the sync dir while its mtime matches the one it
+    # recorded. Our own files change the mtime; if nothing else had changed it
+    # since that sync, record the new one so the next startup isn't a full scan
+    try:
+        mtime_after = sync_dir.stat().st_mtime_ns
+    except OSError:
+        return
+    with _conn() as con:
+        con.execute(
+            "UPDATE sync_state SET value = ? WHERE key = 'dir_mtime_ns' AND value = ?",
+            (str(mtime_after), str(mtime_before)),
+        )
+
+
+def flush_in_background() -> None:
+    """Flushes on a worker thread; anything still pending is flushed at exit."""
+    global _at_exit
+    if not _at_exit:
+        # Registered after store's close_db (imported above), so it runs before it
+        atexit.register(flush)
+        _at_exit = True
+    threading.Thread(target=flush, name="dj-outbox", daemon=True).start()
+
+
+def resume() -> None:
+    """Starts flushing files a previous run queued but never wrote."""
+    if pending():
+        flush_in_background()
@@ -0,0 +1,132 @@
+# profiling.py
+"""
+Opt-in phase profiling: `dailyjournal <cmd> --profile` or DAILYJOURNAL_PROFILE=1.
+
+Code marks phases with `with span("init_db"): ...`; while profiling is off a
+span is a shared no-op object. At exit a per-phase breakdown is printed to
+stderr. `--profile-out FILE` (or DAILYJOURNAL_PROFILE=FILE) also writes
+FILE: a Chrome trace (chrome://tracing, Perfetto) for *.json, otherwise a
+cProfile dump (python -m pstats FILE).
+
+This module is imported first by app.py, so "imports" covers loading the
+rest of the app. Keep it stdlib-light.
+"""
+import os
+import sys
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+T0 = time.perf_counter()
+
+_env = os.environ.get("DAILYJOURNAL_PROFILE", "")
+ENABLED = (bool(_env) and _env != "0") or "--profile" in sys.argv or "--profile-out" in sys.argv
+
+# (name, start, end, thread id)
+_spans: List[Tuple[str, float, float, int]] = []
+_out_path: Optional[str] = None
+_profiler: Any = None
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        add_span(self.name, self.start, time.perf_counter())
+
+
+class _NoSpan:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str) -> Any:
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+def add_span(name: str, start: float, end: float) -> None:
+    if ENABLED:
+        # list.append is atomic; spans also come from background threads
+        _spans.append((name, start, end, threading.get_ident()))
+
+
+def configure(argv: List[str]) -> None:
+    """
+    Strips --profile / --profile-out FILE from argv (in place) and, when
+    profiling is on, arranges the report at exit.
+    """
+    global _out_path, _profiler
+
+    if "--profile" in argv:
+        argv.remove("--profile")
+    if "--profile-out" in argv:
+        i = argv.index("--profile-out")
+        _out_path = argv[i + 1] if i + 1 < len(argv) else None
+        del argv[i:i + 2]
+    if not ENABLED:
+        return
+    if _out_path is None and _env not in ("", "0", "1"):
+        _out_path = _env
+
+    add_span("imports", T0, time.perf_counter())
+
+    import atexit
+
+    if _out_path and not _out_path.endswith(".json"):
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(report)
+
+
+def report() -> None:
+    end = time.perf_counter()
+    if _profiler is not None:
+        _profiler.disable()
+
+    # Phases in the order they started; repeated names are summed
+    totals: dict = {}
+    for name, start, stop, _ in sorted(_spans, key=lambda s: s[1]):
+        count, ms = totals.get(name, (0, 0.0))
+        totals[name] = (count + 1, ms + (stop - start) * 1000)
+
+    out = sys.stderr
+    print("\nPROFILE (ms, spans may overlap or nest)", file=out)
+    for name, (count, ms) in totals.items():
+        times = f" x{count}" if count > 1 else ""
+        print(f"  {name:<24} {ms:>9.1f}{times}", file=out)
+    print(f"  {'total':<24} {(end - T0) * 1000:>9.1f}", file=out)
+
+    if not _out_path:
+        return
+    if _profiler is not None:
+        _profiler.dump_stats(_out_path)
+    else:
+        _write_chrome_trace(_out_path)
+    print(f"  wrote {_out_path}", file=out)
+
+
+def _write_chrome_trace(path: str) -> None:
+    import json
+
+    pid = os.getpid()
+    events = [
+        {"name": name, "ph": "X", "ts": (start - T0) * 1e6, "dur": (stop - start) * 1e6, "pid": pid, "tid": tid}
+        for name, start, stop, tid in _spans
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
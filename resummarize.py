@@ -0,0 +1,303 @@
+# resummarize.py
+"""
+Regenerates stored AM/PM summaries with the current SYSTEM_RULES and model
+(`dailyjournal resummarize`).
+
+Each payload is rebuilt the way a live session builds it: the answers come
+from the session's raw_transcript and, for PMs, the commitments and notes
+from that day's AM. Only summary (and summary_headline) is rewritten; the
+commitments and outcomes stay as recorded. Free entries have no LLM summary
+and are skipped.
+
+Progress is checkpointed per job - a hash of the model and SYSTEM_RULES - in
+resummarize_progress, in the same transaction as each rewrite. An interrupted
+run resumes where it stopped; a finished one is a no-op until the rules or
+the model change.
+
+Online runs send requests from an asyncio pool of `concurrency` workers. A
+rate limit (429) pauses every worker for the Retry-After the API asks for.
+For very large backfills, write_batch() writes the requests as an OpenAI Batch
+API JSONL file and ingest_batch() applies the results file.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import coach
+import llm_stats
+from config import load_config
+from dj_secrets import get_openai_api_key
+from prompts import SYSTEM_RULES
+from store import _conn, _headline, _index_packed_text, get_latest_am_full, get_notes, pack_text
+
+PAGE_SIZE = 200
+PROGRESS_EVERY = 25
+
+
+def job_key(model: str) -> str:
+    return hashlib.sha256(f"{model}\0{SYSTEM_RULES}".encode("utf-8")).hexdigest()[:16]
+
+
+def _answers(raw_transcript: str, prefix: str) -> List[str]:
+    # "AM Q1: ..." lines start answers; other lines continue the current one.
+    # PM transcripts start with the AM commitments, which are skipped.
+    answers: List[str] = []
+    for line in (raw_transcript or "").splitlines():
+        head, sep, rest = line.partition(": ")
+        if sep and head.startswith(prefix) and head[len(prefix):].isdigit():
+            answers.append(rest)
+        elif answers:
+            answers[-1] += "\n" + line
+    return answers
+
+
+def _filters(
+    date_from: Optional[str], date_to: Optional[str], session_type: Optional[str]
+) -> Tuple[str, List[Any]]:
+    where = ["s.session_type IN ('am', 'pm')"]
+    params: List[Any] = []
+    if date_from:
+        where.append("s.session_date >= ?")
+        params.append(date_from)
+    if date_to:
+        where.append("s.session_date <= ?")
+        params.append(date_to)
+    if session_type:
+        where.append("s.session_type = ?")
+        params.append(session_type)
+    return " AND ".join(where), params
+
+
+def count_pending(
+    key: str, date_from: Optional[str] = None, date_to: Optional[str] = None, session_type: Optional[str] = None
+) -> int:
+    where, params = _filters(date_from, date_to, session_type)
+    with _conn() as con:
+        return con.execute(
+            f"""
+            SELECT COUNT(*) FROM sessions s
+            WHERE {where} AND NOT EXISTS (
+                SELECT 1 FROM resummarize_progress p WHERE p.job_key = ? AND p.session_id = s.id
+            )
+            """,
+            params + [key],
+        ).fetchone()[0]
+
+
+def iter_pending(
+    key: str, date_from: Optional[str] = None, date_to: Optional[str] = None, session_type: Optional[str] = None
+) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """Yields (session_id, session_type, payload) for sessions this job hasn't done, by id."""
+    where, params = _filters(date_from, date_to, session_type)
+    after = 0
+    while True:
+        with _conn() as con:
+            rows = con.execute(
+                f"""
+                SELECT s.id, s.session_date, s.session_type, dj_text(s.raw_transcript) FROM sessions s
+                WHERE {where} AND s.id > ? AND NOT EXISTS (
+                    SELECT 1 FROM resummarize_progress p WHERE p.job_key = ? AND p.session_id = s.id
+                )
+                ORDER BY s.id
+                LIMIT ?
+                """,
+                params + [after, key, PAGE_SIZE],
+            ).fetchall()
+        if not rows:
+            return
+        for session_id, session_date, session_type, raw in rows:
+            if session_type == "am":
+                payload = coach.am_payload(_answers(raw, "AM Q"))
+            else:
+                am = dict(get_latest_am_full(session_date) or {})
+                am["append_notes"] = get_notes(session_date, "am")
+                payload = coach.pm_payload(am, _answers(raw, "PM Q"))
+            yield session_id, session_type, payload
+        after = rows[-1][0]
+
+
+def _apply(key: str, session_id: int, summary: str) -> None:
+    with _conn() as con:
+        con.execute(
+            "UPDATE sessions SET summary = ?, summary_headline = ? WHERE id = ?",
+            (pack_text(summary), _headline(summary), session_id),
+        )
+        _index_packed_text(con, session_id)
+        con.execute(
+            "INSERT OR REPLACE INTO resummarize_progress (job_key, session_id, done_at) VALUES (?, ?, ?)",
+            (key, session_id, datetime.utcnow().isoformat(timespec="seconds")),
+        )
+
+
+def reset(key: str) -> int:
+    with _conn() as con:
+        return con.execute("DELETE FROM resummarize_progress WHERE job_key = ?", (key,)).rowcount
+
+
+def _summary_of(text: str) -> str:
+    summary = json.loads(text).get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        raise ValueError("reply has no summary")
+    return summary
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def run(
+    model: str,
+    concurrency: int = 4,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    session_type: Optional[str] = None,
+) -> Dict[str, int]:
+    """Re-summarizes pending sessions online. Returns counts of done / failed."""
+    key = job_key(model)
+    total = count_pending(key, date_from, date_to, session_type)
+    if not total:
+        return {"done": 0, "failed": 0}
+    return asyncio.run(_run_async(model, key, iter_pending(key, date_from, date_to, session_type), total, concurrency))
+
+
+async def _run_async(
+    model: str, key: str, pending: Iterator[Tuple[int, str, Dict[str, Any]]], total: int, concurrency: int
+) -> Dict[str, int]:
+    from openai import APIStatusError, AsyncOpenAI
+
+    cfg = load_config()
+    client = AsyncOpenAI(
+        api_key=get_openai_api_key(),
+        base_url=cfg.openai_base_url or None,
+        timeout=cfg.llm_timeout_s,
+        max_retries=0,
+    )
+    loop = asyncio.get_running_loop()
+    work: "asyncio.Queue[Optional[Tuple[int, str, Dict[str, Any]]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"done": 0, "failed": 0}
+    resume_at = [0.0]  # loop time before which no worker sends (rate limited)
+
+    async def produce() -> None:
+        for item in pending:
+            await work.put(item)
+        for _ in range(concurrency):
+            await work.put(None)
+
+    async def send(session_id: int, payload: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        estimate = coach.estimate_request_tokens(payload)
+        info: Dict[str, Any] = {"retries": 0}
+        attempt = 0
+        while True:
+            wait = resume_at[0] - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await client.responses.create(**coach.build_request(model, payload))
+                coach._store_usage(response, info)
+                summary = _summary_of(response.output_text)
+            except Exception as e:
+                if not coach._is_transient(e) or attempt >= cfg.llm_max_retries:
+                    llm_stats.record_call("resummarize", model, "error", started, estimate, info, type(e).__name__)
+                    print(f"(resummarize) WARNING: session {session_id} failed: {e}")
+                    counts["failed"] += 1
+                    return
+                backoff = _retry_after(e) or random.uniform(
+                    0, min(coach._BACKOFF_CAP_S, coach._BACKOFF_BASE_S * 2 ** attempt)
+                )
+                if isinstance(e, APIStatusError) and e.status_code == 429:
+                    resume_at[0] = max(resume_at[0], loop.time() + backoff)
+                else:
+                    await asyncio.sleep(backoff)
+                attempt += 1
+                info["retries"] = attempt
+                continue
+
+            _apply(key, session_id, summary)
+            llm_stats.record_call("resummarize", model, "ok", started, estimate, info)
+            counts["done"] += 1
+            if counts["done"] % PROGRESS_EVERY == 0:
+                llm_stats.flush()
+                print(f"(resummarize) {counts['done']}/{total}")
+            return
+
+    async def worker() -> None:
+        while True:
+            item = await work.get()
+            if item is None:
+                return
+            session_id, _, payload = item
+            await send(session_id, payload)
+
+    try:
+        await asyncio.gather(produce(), *(worker() for _ in range(concurrency)))
+    finally:
+        await client.close()
+    return counts
+
+
+def write_batch(
+    path: Path,
+    model: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    session_type: Optional[str] = None,
+) -> int:
+    """Writes pending requests as OpenAI Batch API JSONL (one /v1/responses call per line)."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for session_id, _, payload in iter_pending(job_key(model), date_from, date_to, session_type):
+            line = {
+                "custom_id": f"session-{session_id}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": coach.build_request(model, payload),
+            }
+            f.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def _batch_output_text(body: Dict[str, Any]) -> str:
+    if body.get("output_text"):
+        return body["output_text"]
+    return "".join(
+        part.get("text", "")
+        for item in body.get("output") or []
+        if item.get("type") == "message"
+        for part in item.get("content") or []
+        if part.get("type") == "output_text"
+    )
+
+
+def ingest_batch(path: Path, model: str) -> Dict[str, int]:
+    """Applies a Batch API results JSONL written for model. Returns counts of done / failed."""
+    key = job_key(model)
+    counts = {"done": 0, "failed": 0}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                session_id = int(result["custom_id"].removeprefix("session-"))
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    raise ValueError(result.get("error") or f"status {response.get('status_code')}")
+                summary = _summary_of(_batch_output_text(response["body"]))
+            except Exception as e:
+                print(f"(resummarize) WARNING: skipping batch result: {e}")
+                counts["failed"] += 1
+                continue
+            _apply(key, session_id, summary)
+            counts["done"] += 1
+    return counts
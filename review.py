@@ -0,0 +1,181 @@
+# review.py
+"""
+Weekly / monthly / yearly retrospectives (`dailyjournal review`), built
+map-reduce style so no prompt ever holds more than a few weeks of text:
+
+    week   -> digest of that ISO week's sessions and notes      (map)
+    month  -> review of its week digests + rollup stats         (reduce)
+    year   -> review of its month reviews + rollup stats        (reduce)
+
+Every result is cached in review_digests under a hash of its inputs (the
+entries, or the child digests), the model and the prompts. A week is only
+re-digested when its sessions or notes change, and a change ripples up only
+through its month and year. A warm yearly review is a handful of calls.
+
+A week belongs to the month (and year) of its Thursday, like ISO years, so
+each week is counted exactly once.
+"""
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import coach
+import rollups
+from prompts import SYSTEM_RULES
+from store import _conn
+
+DIGEST_WORKERS = 4
+
+
+def _hash(model: str, content: Any) -> str:
+    blob = json.dumps(
+        {"model": model, "system": SYSTEM_RULES, "specs": [coach._DIGEST_SPEC, coach._REVIEW_SPEC], "content": content},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _week_monday(week: str) -> date:
+    year, num = week.split("-W")
+    return date.fromisocalendar(int(year), int(num), 1)
+
+
+def weeks_of(grain: str, period: str) -> List[str]:
+    """ISO weeks whose Thursday falls in the month (YYYY-MM) or year (YYYY)."""
+    year = int(period[:4])
+    thursday = date.fromisocalendar(year - 1, 52, 4)  # safely before the period
+    weeks = []
+    while thursday.year <= year:
+        if rollups.period_key(grain, thursday) == period:
+            weeks.append(rollups.period_key("week", thursday))
+        thursday += timedelta(days=7)
+    return weeks
+
+
+def _week_entries(week: str) -> Dict[str, Any]:
+    start = _week_monday(week)
+    end = start + timedelta(days=6)
+    with _conn() as con:
+        sessions = con.execute(
+            """
+            SELECT session_date, session_type, dj_text(summary), work_done, family_done, distraction_cause, improvement
+            FROM sessions
+            WHERE session_date BETWEEN ? AND ?
+            ORDER BY session_date, id
+            """,
+            (start.isoformat(), end.isoformat()),
+        ).fetchall()
+        notes = con.execute(
+            "SELECT session_date, note_text FROM notes WHERE session_date BETWEEN ? AND ? ORDER BY session_date, id",
+            (start.isoformat(), end.isoformat()),
+        ).fetchall()
+    return {
+        "sessions": [
+            {
+                k: v
+                for k, v in zip(
+                    ("date", "type", "summary", "work_done", "family_done", "distraction_cause", "improvement"), row
+                )
+                if v is not None
+            }
+            for row in sessions
+        ],
+        "notes": [{"date": d, "text": t} for d, t in notes],
+    }
+
+
+def _cached(period: str, content_hash: str) -> Optional[str]:
+    with _conn() as con:
+        row = con.execute(
+            "SELECT digest FROM review_digests WHERE period = ? AND content_hash = ?", (period, content_hash)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _save(period: str, grain: str, content_hash: str, model: str, digest: str) -> None:
+    with _conn() as con:
+        con.execute(
+            """
+            INSERT INTO review_digests (period, grain, content_hash, model, digest, created_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(period) DO UPDATE SET
+                content_hash = excluded.content_hash, model = excluded.model,
+                digest = excluded.digest, created_at = excluded.created_at
+            """,
+            (period, grain, content_hash, model, digest),
+        )
+
+
+def week_digests(model: str, weeks: List[str], calls: Dict[str, int]) -> Dict[str, str]:
+    """Digest per week (weeks without entries are left out). Stale or missing ones are made in parallel."""
+    digests: Dict[str, str] = {}
+    todo: List[Tuple[str, str, Dict[str, Any]]] = []
+    for week in weeks:
+        entries = _week_entries(week)
+        if not entries["sessions"] and not entries["notes"]:
+            continue
+        content_hash = _hash(model, entries)
+        cached = _cached(week, content_hash)
+        if cached is not None:
+            digests[week] = cached
+        else:
+            todo.append((week, content_hash, entries))
+
+    if todo:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=DIGEST_WORKERS, thread_name_prefix="dj-digest") as pool:
+            futures = [(week, h, pool.submit(coach.digest_week, model, week, e)) for week, h, e in todo]
+            for week, content_hash, future in futures:
+                digests[week] = future.result()
+                _save(week, "week", content_hash, model, digests[week])
+                calls["llm"] += 1
+
+    return {week: digests[week] for week in weeks if week in digests}
+
+
+def _stats(grain: str, period: str) -> Dict[str, Any]:
+    with _conn() as con:
+        stats = rollups.period_stats(con, grain, period)
+    return {k: v for k, v in stats.items() if k not in ("grain", "period")}
+
+
+def review(
+    model: str,
+    grain: str,
+    period: str,
+    calls: Dict[str, int],
+    on_summary: Optional[Callable[[str], None]] = None,
+) -> Optional[str]:
+    """
+    The review of period (grain week/month/year), or None if it has no entries.
+    Cached results are returned without calling on_summary.
+    """
+    if grain == "week":
+        return week_digests(model, [period], calls).get(period)
+
+    if grain == "month":
+        parts = week_digests(model, weeks_of("month", period), calls)
+    else:
+        # Digest the whole year's weeks in one parallel pass, then reduce per month
+        week_digests(model, weeks_of("year", period), calls)
+        months = [f"{period}-{m:02d}" for m in range(1, 13)]
+        parts = {m: r for m in months if (r := review(model, "month", m, calls)) is not None}
+    if not parts:
+        return None
+
+    stats = _stats(grain, period)
+    content = {"stats": stats, "parts": parts}
+    content_hash = _hash(model, content)
+    cached = _cached(period, content_hash)
+    if cached is not None:
+        return cached
+
+    text = coach.review_period(
+        model, period, stats, [{"period": p, "digest": d} for p, d in parts.items()], on_summary
+    )
+    _save(period, grain, content_hash, model, text)
+    calls["llm"] += 1
+    return text
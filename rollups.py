@@ -0,0 +1,191 @@
+# rollups.py
+"""
+Incrementally maintained accountability rollups.
+
+Every session insert folds into per-day/week/month/year counters (rollups) and
+into streak runs (streak_runs/streak_best), inside the same transaction as the
+insert. Reading stats is then a handful of primary-key lookups no matter how
+much history exists.
+
+Streak runs use interval endpoints: for a run of consecutive active days, the
+last day's run_start and the first day's run_end are kept accurate, so adding
+a day - even one that arrives late from another machine and bridges two runs -
+touches at most its two neighbours.
+"""
+import sqlite3
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+GRAINS = ("day", "week", "month", "year")
+
+# Streak kinds: a PM review happened / the work or family commitment was done.
+STREAK_KINDS = ("journal", "work", "family")
+
+
+def period_key(grain: str, d: date) -> str:
+    if grain == "day":
+        return d.isoformat()
+    if grain == "week":
+        iso = d.isocalendar()
+        return f"{iso[0]}-W{iso[1]:02d}"
+    if grain == "month":
+        return f"{d.year}-{d.month:02d}"
+    return str(d.year)
+
+
+def _flag(value: Any) -> int:
+    try:
+        return 1 if int(value or 0) else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def record_sessions(con: sqlite3.Connection, sessions: Iterable[Dict[str, Any]]) -> None:
+    """
+    Folds new sessions (dicts with session_date, session_type and, for PMs,
+    work_done/family_done) into the rollups. Call inside the insert's transaction.
+    """
+    # Aggregate per day first so a batch import costs a few statements per day
+    per_day: Dict[str, Dict[str, int]] = {}
+    for s in sessions:
+        day = s.get("session_date")
+        stype = s.get("session_type")
+        if not day or stype not in ("am", "pm", "free"):
+            continue
+        agg = per_day.setdefault(day, {"am": 0, "pm": 0, "free": 0, "work": 0, "family": 0})
+        agg[stype] += 1
+        if stype == "pm":
+            agg["work"] += _flag(s.get("work_done"))
+            agg["family"] += _flag(s.get("family_done"))
+
+    for day, agg in per_day.items():
+        try:
+            d = date.fromisoformat(day)
+        except ValueError:
+            continue
+        _apply_day(con, d, agg)
+
+
+def _apply_day(con: sqlite3.Connection, d: date, agg: Dict[str, int]) -> None:
+    row = con.execute(
+        "SELECT am_count, pm_count, work_done, family_done FROM rollups WHERE grain = 'day' AND period = ?",
+        (d.isoformat(),),
+    ).fetchone()
+    old_am, old_pm, old_work, old_family = row or (0, 0, 0, 0)
+    new_am, new_pm = old_am + agg["am"], old_pm + agg["pm"]
+
+    # Days with an AM but no PM review
+    gap_delta = int(new_am > 0 and new_pm == 0) - int(old_am > 0 and old_pm == 0)
+
+    for grain in GRAINS:
+        con.execute(
+            """
+            INSERT INTO rollups (grain, period, am_count, pm_count, free_count, work_done, family_done, gap_days)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(grain, period) DO UPDATE SET
+                am_count = am_count + excluded.am_count,
+                pm_count = pm_count + excluded.pm_count,
+                free_count = free_count + excluded.free_count,
+                work_done = work_done + excluded.work_done,
+                family_done = family_done + excluded.family_done,
+                gap_days = gap_days + excluded.gap_days
+            """,
+            (grain, period_key(grain, d), agg["am"], agg["pm"], agg["free"], agg["work"], agg["family"], gap_delta),
+        )
+
+    if new_pm and not old_pm:
+        _activate(con, "journal", d)
+    if agg["work"] and not old_work:
+        _activate(con, "work", d)
+    if agg["family"] and not old_family:
+        _activate(con, "family", d)
+
+
+def _run_row(con: sqlite3.Connection, kind: str, d: date) -> Optional[Tuple[str, str]]:
+    return con.execute(
+        "SELECT run_start, run_end FROM streak_runs WHERE kind = ? AND day = ?",
+        (kind, d.isoformat()),
+    ).fetchone()
+
+
+def _activate(con: sqlite3.Connection, kind: str, d: date) -> None:
+    if _run_row(con, kind, d):
+        return
+
+    # d-1 is the last day of its run and d+1 the first of its run, so their
+    # run_start/run_end are accurate
+    left = _run_row(con, kind, d - timedelta(days=1))
+    right = _run_row(con, kind, d + timedelta(days=1))
+    start = left[0] if left else d.isoformat()
+    end = right[1] if right else d.isoformat()
+
+    con.execute(
+        "INSERT INTO streak_runs (kind, day, run_start, run_end) VALUES (?, ?, ?, ?)",
+        (kind, d.isoformat(), start, end),
+    )
+    con.execute("UPDATE streak_runs SET run_end = ? WHERE kind = ? AND day = ?", (end, kind, start))
+    con.execute("UPDATE streak_runs SET run_start = ? WHERE kind = ? AND day = ?", (start, kind, end))
+
+    length = (date.fromisoformat(end) - date.fromisoformat(start)).days + 1
+    con.execute(
+        """
+        INSERT INTO streak_best (kind, length, run_start, run_end) VALUES (?, ?, ?, ?)
+        ON CONFLICT(kind) DO UPDATE SET
+            length = excluded.length, run_start = excluded.run_start, run_end = excluded.run_end
+        WHERE excluded.length > streak_best.length
+        """,
+        (kind, length, start, end),
+    )
+
+
+def rebuild(con: sqlite3.Connection) -> None:
+    """Recomputes everything from the sessions table (migration backfill, after dedup)."""
+    con.execute("DELETE FROM rollups")
+    con.execute("DELETE FROM streak_runs")
+    con.execute("DELETE FROM streak_best")
+    cur = con.execute(
+        "SELECT session_date, session_type, work_done, family_done FROM sessions ORDER BY session_date"
+    )
+    record_sessions(
+        con,
+        ({"session_date": r[0], "session_type": r[1], "work_done": r[2], "family_done": r[3]} for r in cur),
+    )
+
+
+def current_streak(con: sqlite3.Connection, kind: str, today: date) -> int:
+    # A streak stays alive through today until tonight's PM is (or isn't) done
+    for d in (today, today - timedelta(days=1)):
+        row = _run_row(con, kind, d)
+        if row:
+            return (d - date.fromisoformat(row[0])).days + 1
+    return 0
+
+
+def longest_streak(con: sqlite3.Connection, kind: str) -> Dict[str, Any]:
+    row = con.execute(
+        "SELECT length, run_start, run_end FROM streak_best WHERE kind = ?", (kind,)
+    ).fetchone()
+    if not row:
+        return {"length": 0, "start": None, "end": None}
+    return {"length": row[0], "start": row[1], "end": row[2]}
+
+
+def period_stats(con: sqlite3.Connection, grain: str, period: str) -> Dict[str, Any]:
+    row = con.execute(
+        """
+        SELECT am_count, pm_count, free_count, work_done, family_done, gap_days
+        FROM rollups WHERE grain = ? AND period = ?
+        """,
+        (grain, period),
+    ).fetchone()
+    am, pm, free, work, family, gaps = row or (0, 0, 0, 0, 0, 0)
+    return {
+        "grain": grain,
+        "period": period,
+        "am": am,
+        "pm": pm,
+        "free": free,
+        "work_rate": (work / pm) if pm else None,
+        "family_rate": (family / pm) if pm else None,
+        "am_without_pm_days": gaps,
+    }
@@ -0,0 +1,152 @@
+# segments.py
+"""
+Monthly segment files for the sync dir.
+
+`dailyjournal compact` packs older per-entry JSON files into one segment per
+month so the sync folder stops growing by several files a day. A segment is
+written once (temp file + fsync + rename) and never modified; each compaction
+run writes new segments, so two machines never write the same file.
+
+Layout (UTF-8 text):
+
+    DJSEG1\n
+    {"file_name": "...", "entry": {...}}\n      one line per packed file
+    ...
+    {"index": [["<file_name>", offset, length], ...]}\n
+    DJSEG-INDEX <index offset, 20 digits>\n     fixed-size trailer
+
+The original file names are kept so imports stay idempotent through
+imported_files, whether an entry was seen loose or inside a segment.
+"""
+import json
+import os
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from entries import _safe_sync_dir, _utc_now_iso, read_entry_file, scan_entry_names
+
+SEGMENT_SUFFIX = ".djseg"
+_MAGIC = b"DJSEG1\n"
+_TRAILER_PREFIX = b"DJSEG-INDEX "
+_TRAILER_LEN = len(_TRAILER_PREFIX) + 20 + 1
+
+
+def segment_month(name: str) -> str:
+    # Segment names start with their month: YYYY-MM_segment_...
+    return name[:7]
+
+
+def iter_segment_files() -> List[Path]:
+    sync_dir = _safe_sync_dir()
+    if sync_dir is None:
+        return []
+    with os.scandir(sync_dir) as it:
+        names = [e.name for e in it if e.name.endswith(SEGMENT_SUFFIX) and e.is_file()]
+    return [sync_dir / n for n in sorted(names)]
+
+
+def read_segment_index(path: Path) -> List[Tuple[str, int, int]]:
+    """(file_name, offset, length) for every record, read from the trailer without scanning."""
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path.name} is not a dailyjournal segment")
+        f.seek(-_TRAILER_LEN, os.SEEK_END)
+        trailer = f.read(_TRAILER_LEN)
+        if not trailer.startswith(_TRAILER_PREFIX):
+            raise ValueError(f"{path.name} has no segment index (truncated?)")
+        f.seek(int(trailer[len(_TRAILER_PREFIX):].strip()))
+        index = json.loads(f.readline())["index"]
+    return [(name, offset, length) for name, offset, length in index]
+
+
+def read_segment_entries(path: Path, names: Optional[Set[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yields (file_name, entry) for records in names (all if None), seeking straight to each."""
+    index = read_segment_index(path)
+    with open(path, "rb") as f:
+        for name, offset, length in index:
+            if names is not None and name not in names:
+                continue
+            f.seek(offset)
+            record = json.loads(f.read(length))
+            yield record["file_name"], record["entry"]
+
+
+def write_segment(sync_dir: Path, month: str, records: List[Tuple[str, Dict[str, Any]]]) -> Optional[Path]:
+    """Writes records into a new segment for month. Returns None if there was nothing to write."""
+    if not records:
+        return None
+
+    ts = _utc_now_iso().replace("-", "").replace(":", "")
+    path = sync_dir / f"{month}_segment_{ts}_{uuid4().hex[:12]}{SEGMENT_SUFFIX}"
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+
+    index = []
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        for name, entry in records:
+            line = json.dumps({"file_name": name, "entry": entry}, ensure_ascii=False, separators=(",", ":"))
+            data = line.encode("utf-8")
+            index.append([name, f.tell(), len(data)])
+            f.write(data + b"\n")
+
+        index_offset = f.tell()
+        f.write(json.dumps({"index": index}, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        f.write(_TRAILER_PREFIX + f"{index_offset:020d}".encode("ascii") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    tmp_path.replace(path)
+    return path
+
+
+def compact_sync_dir(before_month: Optional[str] = None) -> Dict[str, int]:
+    """
+    Packs loose entry files dated before before_month (YYYY-MM, default: the
+    current month) into one new segment per month, then deletes the loose files.
+    Loose files already packed by an earlier (interrupted) run are just deleted.
+    """
+    sync_dir = _safe_sync_dir()
+    counts = {"segments": 0, "packed": 0, "removed": 0, "failed": 0}
+    if sync_dir is None:
+        return counts
+
+    before_month = before_month or date.today().isoformat()[:7]
+    by_month: Dict[str, List[str]] = defaultdict(list)
+    for name in scan_entry_names():
+        if name[:7] < before_month:
+            by_month[name[:7]].append(name)
+
+    packed_by_month: Dict[str, Set[str]] = defaultdict(set)
+    for seg in iter_segment_files():
+        try:
+            packed_by_month[segment_month(seg.name)].update(n for n, _, _ in read_segment_index(seg))
+        except Exception as e:
+            print(f"(compact) WARNING: skipping unreadable segment {seg.name}: {e}")
+
+    for month in sorted(by_month):
+        names = sorted(by_month[month])
+        already = packed_by_month[month]
+        to_pack = [n for n in names if n not in already]
+
+        records = []
+        for name in to_pack:
+            try:
+                records.append((name, read_entry_file(sync_dir / name)))
+            except Exception as e:
+                # Leave bad files loose so they stay visible to sync warnings
+                print(f"(compact) WARNING: leaving {name} unpacked: {e}")
+                counts["failed"] += 1
+
+        if write_segment(sync_dir, month, records):
+            counts["segments"] += 1
+            counts["packed"] += len(records)
+
+        # Only delete once the segment is safely renamed into place
+        for name in [n for n, _ in records] + [n for n in names if n in already]:
+            (sync_dir / name).unlink(missing_ok=True)
+            counts["removed"] += 1
+
+    return counts
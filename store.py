@@ -1,103 +1,273 @@
 # store.py
+import atexit
+import hashlib
+import json
 import sqlite3
-from datetime import datetime, date
-from typing import Optional, Dict, Any, List
+import sys
+import threading
+import zlib
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Iterable, Iterator, Set, Tuple
 import os
 from pathlib import Path
+from uuid import uuid4
+
+import rollups
+from rollups import record_sessions
 
 def _db_file_path() -> Path:
     # Env var override wins (backwards compatible)
     env = os.getenv("DAILYJOURNAL_DB_PATH")
     if env:
-        return Path(env).expanduser()
+        return _resolve_path(env)
 
-    # Config fallback
+    # Config fallback (memoized in config.load_config)
     from config import load_config
     cfg = load_config()
-    return Path(cfg.db_path).expanduser()
+    return _resolve_path(cfg.db_path)
 
 
-def _conn() -> sqlite3.Connection:
-    db_path = _db_file_path()
+@lru_cache(maxsize=None)
+def _resolve_path(raw: str) -> Path:
+    return Path(raw).expanduser()
+
+
+# One connection per thread, opened on first use and kept for the life of the
+# thread (the main thread's is closed at exit). Background workers - e.g. a
+# speculative LLM call writing to the response cache - get their own, since
+# sqlite3 connections can't be shared across threads.
+# Callers keep using `with _conn() as con:` - on a sqlite3 connection that
+# block is a transaction (commit/rollback), it does not close the connection.
+_CACHED_STATEMENTS = 256
+_PAGE_CACHE_KIB = 16 * 1024
+
+_local = threading.local()
+
+
+def _open(db_path: Path) -> sqlite3.Connection:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    return sqlite3.connect(db_path)
+    con = sqlite3.connect(db_path, cached_statements=_CACHED_STATEMENTS)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute(f"PRAGMA cache_size=-{_PAGE_CACHE_KIB}")
+    # Reads compressed text columns in queries; see pack_text. The schema itself
+    # never calls it, so any SQLite client can still open and write the DB.
+    con.create_function("dj_text", 1, unpack_text, deterministic=True)
+    return con
+
+
+def _conn() -> sqlite3.Connection:
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _local.con = _open(_db_file_path())
+    return con
+
+
+def close_db() -> None:
+    """Closes this thread's connection; the next _conn() reopens it."""
+    global _schema_ready
+    _schema_ready = False
+    con = getattr(_local, "con", None)
+    if con is None:
+        return
+    try:
+        # Fold the WAL back into the main file so a quiet DB is a single file
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except sqlite3.Error:
+        pass
+    con.close()
+    _local.con = None
+
+
+atexit.register(close_db)
+
+
+_schema_ready = False
 
 
 def init_db() -> None:
-    with _conn() as con:
+    """
+    Brings the DB schema up to date (see migrations.py).
+    When the schema is current this is a single PRAGMA read, and nothing at all
+    on later calls in the same process.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+
+    from migrations import migrate
+    migrate(_conn())
+    _schema_ready = True
+
+
+# Optional compressed storage of long text columns (compress_text in config.toml,
+# `dailyjournal compress`). A compressed value is a BLOB - a format byte, then
+# zlib data - and plain TEXT values are left as they are, so both can sit in the
+# same column. Queries read these columns through dj_text(); Python code that
+# selects them raw goes through unpack_text(). The sessions_fts triggers index
+# plain values only; _index_packed_text indexes the text of compressed ones.
+COMPRESSED_COLUMNS = ("raw_transcript", "summary", "free_text")
+COMPRESS_MIN_BYTES = 256
+
+_FORMAT_ZLIB_V1 = b"\x01"
+# Preset dictionary: the labels every transcript and summary repeats, most
+# common last. Stored values depend on it byte for byte - never edit it; add a
+# new format byte and dictionary instead.
+_ZDICT_V1 = (
+    "AM Additional Notes:\nAppend Notes from today:\n- If I feel stress, then I will instead of "
+    "checking my phone. meeting family work kids dinner tomorrow today\n"
+    "Stress Trigger: \nIf-Then Plan: If \nWork One Thing: \nFamily One Thing: \n"
+    "Work Result: missed\nFamily Result: missed\nWork Result: done\nFamily Result: done\n"
+    "Distraction Cause: \nImprovement: \nTomorrow Focus: \n"
+    "AM Commitments:\n- Work One Thing: \n- Family One Thing: \n- If-Then Plan: \n\n"
+    "PM Q1: \nPM Q2: \nPM Q3: \nPM Q4: \nAM Q1: \nAM Q2: \nAM Q3: \nAM Q4: "
+).encode("utf-8")
+
+
+def _compress_text() -> bool:
+    from config import load_config
+    return load_config().compress_text
+
+
+def pack_text(value: Optional[str], compress: Optional[bool] = None) -> Any:
+    """
+    value as stored: zlib-compressed when compress (default: compress_text in
+    config.toml) and it is long enough to be worth it, otherwise unchanged.
+    """
+    if value is None or not (_compress_text() if compress is None else compress):
+        return value
+    raw = value.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return value
+    c = zlib.compressobj(zdict=_ZDICT_V1)
+    packed = _FORMAT_ZLIB_V1 + c.compress(raw) + c.flush()
+    return packed if len(packed) < len(raw) else value
+
+
+def unpack_text(value: Any) -> Any:
+    """The text of a stored value (pack_text's inverse); anything but a BLOB is returned as is."""
+    if not isinstance(value, bytes):
+        return value
+    if value[:1] != _FORMAT_ZLIB_V1:
+        raise ValueError("unknown compressed text format")
+    d = zlib.decompressobj(zdict=_ZDICT_V1)
+    return (d.decompress(value[1:]) + d.flush()).decode("utf-8")
+
+
+def _index_packed_text(con: sqlite3.Connection, session_id: int) -> None:
+    # Call after any write to a session's text: the update trigger rewrites the
+    # whole FTS row, so every compressed column is indexed again, not just the
+    # ones written
+    row = con.execute(
+        f"SELECT {', '.join(COMPRESSED_COLUMNS)} FROM sessions WHERE id = ?", (session_id,)
+    ).fetchone()
+    packed = {col: value for col, value in zip(COMPRESSED_COLUMNS, row or ()) if isinstance(value, bytes)}
+    if packed:
         con.execute(
-            """
-        CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_date TEXT NOT NULL,          -- YYYY-MM-DD
-            session_type TEXT NOT NULL,          -- 'am' or 'pm'
-            raw_transcript TEXT NOT NULL,
-            summary TEXT NOT NULL,
-
-            -- AM commitments
-            work_one_thing TEXT,
-            family_one_thing TEXT,
-            if_then_plan TEXT,
-
-            -- PM outcomes
-            work_done INTEGER,                   -- 0/1
-            family_done INTEGER,                 -- 0/1
-            distraction_cause TEXT,
-            improvement TEXT,
-            tomorrow_focus TEXT,
-
-            free_text TEXT,
-            created_at TEXT NOT NULL
-        )
-        """
+            f"UPDATE sessions_fts SET {', '.join(f'{col} = ?' for col in packed)} WHERE rowid = ?",
+            (*(unpack_text(value) for value in packed.values()), session_id),
         )
 
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_date TEXT NOT NULL,         -- YYYY-MM-DD
-                target_session_type TEXT NOT NULL,  -- "am"
-                note_text TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            )
-            """
-        )
-        con.execute(
-            "CREATE INDEX IF NOT EXISTS idx_notes_date_type ON notes(session_date, target_session_type)"
-        )
 
+def _headline(summary: Optional[str]) -> str:
+    """First line of a summary; stored so listings never read whole summaries."""
+    lines = (summary or "").splitlines()
+    return lines[0] if lines else ""
 
-        con.execute(
-            "CREATE INDEX IF NOT EXISTS idx_sessions_date_type ON sessions(session_date, session_type)"
-        )
 
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS imported_files (
-                file_name TEXT PRIMARY KEY,
-                imported_at TEXT NOT NULL
-            )
-            """
-        )
+def new_entry_id() -> str:
+    return uuid4().hex[:12]
+
+
+# Rows written before entry ids were stored have none, so their own export
+# file can't be recognised by id. It is matched by content_hash instead: same
+# content, created within LEGACY_MATCH_SECONDS of the row (a local insert and
+# its export are written moments apart). Only a local row matches an imported
+# one: local inserts store created_at without the "Z" that every entry file's
+# timestamp ends in. So identical entries made at different times, or typed
+# twice in a row on one machine, stay separate. created_at and headlines are
+# left out of the hash: they differ between a local insert and its own export.
+LEGACY_MATCH_SECONDS = 10
+
+_SESSION_HASH_FIELDS = (
+    "session_date", "session_type", "raw_transcript", "summary",
+    "work_one_thing", "family_one_thing", "if_then_plan",
+    "work_done", "family_done", "distraction_cause", "improvement", "tomorrow_focus",
+    "free_text",
+)
+_NOTE_HASH_FIELDS = ("session_date", "target_session_type", "note_text")
+
 
-def insert_session(payload: Dict[str, Any]) -> None:
-    """Insert a session row."""
+def _content_hash(entry: Dict[str, Any], fields: Tuple[str, ...]) -> str:
+    # "" and None, True and 1 hash alike: imports and local inserts default them differently
+    values = [int(v) if isinstance(v, bool) else (v if v != "" else None) for v in (entry.get(k) for k in fields)]
+    blob = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def session_content_hash(entry: Dict[str, Any]) -> str:
+    return _content_hash(entry, _SESSION_HASH_FIELDS)
+
+
+def note_content_hash(note: Dict[str, Any]) -> str:
+    return _content_hash({"target_session_type": "am", **note}, _NOTE_HASH_FIELDS)
+
+
+def _legacy_match_sql(table: str) -> str:
+    # Gives the oldest matching id-less row the file's id; rowcount 1 means matched
+    return f"""
+        UPDATE {table} SET entry_id = ? WHERE id = (
+            SELECT id FROM {table}
+            WHERE content_hash = ? AND entry_id IS NULL AND created_at NOT LIKE '%Z'
+              AND abs(julianday(rtrim(created_at, 'Z')) - julianday(rtrim(?, 'Z'))) * 86400
+                  <= {LEGACY_MATCH_SECONDS}
+            ORDER BY id
+            LIMIT 1
+        )
+    """
+
+
+def _queue_export(con: sqlite3.Connection, name: str, text: str) -> None:
+    # Written to the sync dir later by outbox.flush(). Marked imported now, so
+    # this machine never reads its own export back.
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    con.execute("INSERT INTO export_outbox (file_name, body, created_at) VALUES (?, ?, ?)", (name, text, now))
+    con.execute("INSERT OR IGNORE INTO imported_files (file_name, imported_at) VALUES (?, ?)", (name, now))
+
+
+def insert_session(payload: Dict[str, Any], export: bool = False) -> Optional[str]:
+    """
+    Insert a session row.
+    payload gets an entry_id if it has none; its entry file carries the same id,
+    so this session is skipped when its export is imported on another machine.
+    With export, the entry file is queued in the same transaction (see
+    outbox.py) and its name returned. Nothing is queued if payload's entry_id
+    is already stored.
+    """
+    if not payload.get("entry_id"):
+        payload["entry_id"] = new_entry_id()
+    compress = _compress_text()
+    stored = {col: pack_text(payload.get(col), compress) for col in COMPRESSED_COLUMNS}
     with _conn() as con:
-        con.execute(
+        cur = con.execute(
             """
         INSERT INTO sessions (
-            session_date, session_type, raw_transcript, summary,
+            session_date, session_type, raw_transcript, summary, summary_headline,
             work_one_thing, family_one_thing, if_then_plan,
             work_done, family_done, distraction_cause,
-            improvement, tomorrow_focus, free_text, created_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            improvement, tomorrow_focus, free_text, created_at,
+            entry_id, content_hash
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
         """,
             (
                 payload["session_date"],
                 payload["session_type"],
-                payload["raw_transcript"],
-                payload["summary"],
+                stored["raw_transcript"],
+                stored["summary"],
+                _headline(payload["summary"]),
                 payload.get("work_one_thing"),
                 payload.get("family_one_thing"),
                 payload.get("if_then_plan"),
@@ -106,17 +276,31 @@ def insert_session(payload: Dict[str, Any]) -> None:
                 payload.get("distraction_cause"),
                 payload.get("improvement"),
                 payload.get("tomorrow_focus"),
-                payload.get("free_text"),
+                stored["free_text"],
                 datetime.utcnow().isoformat(timespec="seconds"),
+                payload["entry_id"],
+                session_content_hash(payload),
             ),
         )
+        if not cur.rowcount:
+            return None
+        if any(isinstance(value, bytes) for value in stored.values()):
+            _index_packed_text(con, cur.lastrowid)
+        record_sessions(con, [payload])
+        if export:
+            from entries import entry_file
+
+            name, text = entry_file(payload)
+            _queue_export(con, name, text)
+            return name
+    return None
 
 
 def get_latest_am(session_date: str) -> Optional[Dict[str, Any]]:
     with _conn() as con:
         cur = con.execute(
             """
-            SELECT work_one_thing, family_one_thing, if_then_plan, summary 
+            SELECT work_one_thing, family_one_thing, if_then_plan, dj_text(summary)
             FROM sessions
             WHERE session_date = ? AND session_type = 'am'
             ORDER BY id DESC
@@ -141,7 +325,7 @@ def get_last_n_summaries(n: int = 10) -> List[Dict[str, str]]:
     with _conn() as con:
         cur = con.execute(
             """
-            SELECT session_date, session_type, summary
+            SELECT session_date, session_type, dj_text(summary)
             FROM sessions
             ORDER BY session_date DESC, id DESC
             LIMIT ?
@@ -152,6 +336,64 @@ def get_last_n_summaries(n: int = 10) -> List[Dict[str, str]]:
 
     return [{"date": r[0], "type": r[1], "summary": r[2]} for r in rows]
 
+# Rows fetched per keyset page by iter_history
+HISTORY_PAGE_SIZE = 200
+
+
+def iter_history(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: Optional[int] = None,
+    newest_first: bool = True,
+    page_size: int = HISTORY_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streams (date, type, headline) rows ordered by (session_date, id).
+    Pages are fetched with keyset pagination on the covering idx_sessions_history
+    index, so memory stays bounded and each page starts where the last one ended.
+    """
+    op, order = ("<", "DESC") if newest_first else (">", "ASC")
+    filters = []
+    params: List[Any] = []
+    if date_from:
+        filters.append("session_date >= ?")
+        params.append(date_from)
+    if date_to:
+        filters.append("session_date <= ?")
+        params.append(date_to)
+
+    after: Optional[Tuple[str, int]] = None
+    remaining = limit
+    while remaining is None or remaining > 0:
+        where = list(filters)
+        page_params = list(params)
+        if after is not None:
+            where.append(f"(session_date, id) {op} (?, ?)")
+            page_params.extend(after)
+        n = page_size if remaining is None else min(page_size, remaining)
+
+        with _conn() as con:
+            rows = con.execute(
+                f"""
+                SELECT session_date, id, session_type, summary_headline
+                FROM sessions
+                {"WHERE " + " AND ".join(where) if where else ""}
+                ORDER BY session_date {order}, id {order}
+                LIMIT ?
+                """,
+                page_params + [n],
+            ).fetchall()
+
+        for r in rows:
+            yield {"date": r[0], "id": r[1], "type": r[2], "headline": r[3] or ""}
+
+        if len(rows) < n:
+            return
+        after = (rows[-1][0], rows[-1][1])
+        if remaining is not None:
+            remaining -= len(rows)
+
+
 def get_latest_pm_with_tomorrow_focus() -> Optional[Dict[str, Any]]:
     with _conn() as con:
         cur = con.execute(
@@ -171,8 +413,10 @@ def get_latest_pm_with_tomorrow_focus() -> Optional[Dict[str, Any]]:
     return {"session_date": row[0], "tomorrow_focus": row[1]}
 
 def delete_db_file() -> bool:
-    from pathlib import Path
-    p = _db_file_path() 
+    close_db()
+    p = _db_file_path()
+    for suffix in ("-wal", "-shm", ".vectors"):
+        Path(str(p) + suffix).unlink(missing_ok=True)
     if p.exists():
         p.unlink()
         return True
@@ -194,51 +438,251 @@ def mark_file_imported(file_name: str) -> None:
             (file_name, datetime.utcnow().isoformat(timespec="seconds")),
         )
 
+# Entries already stored under the same entry_id are skipped by its unique
+# index (see _legacy_match_sql for rows that have no id).
+_SESSION_IMPORT_SQL = """
+    INSERT INTO sessions (
+        session_date, session_type, raw_transcript, summary, summary_headline,
+        work_one_thing, family_one_thing, if_then_plan,
+        work_done, family_done,
+        distraction_cause, improvement, tomorrow_focus,
+        free_text,
+        created_at,
+        entry_id, content_hash
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+"""
+
+_NOTE_IMPORT_SQL = """
+    INSERT INTO notes (session_date, target_session_type, note_text, created_at, entry_id, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT DO NOTHING
+"""
+
+
+def _text_field(entry: Dict[str, Any], key: str) -> Optional[str]:
+    value = entry.get(key)
+    if value is None or isinstance(value, str):
+        return value
+    raise ValueError(f"{key} must be text, not {type(value).__name__}")
+
+
+def _flag_field(entry: Dict[str, Any], key: str) -> Optional[int]:
+    value = entry.get(key)
+    if value is None:
+        return None
+    if isinstance(value, int) and value in (0, 1):
+        return int(value)  # bools too
+    raise ValueError(f"{key} must be 0/1, not {value!r}")
+
+
+def _session_row_from_entry(entry: Dict[str, Any], compress: bool = False) -> tuple:
+    # Entry files come from other machines (and hand edits): every value is
+    # checked here, so a bad file fails alone instead of at bind time
+    session_date = _text_field(entry, "session_date")
+    session_type = _text_field(entry, "session_type")
+    if not session_date or not session_type:
+        raise ValueError("entry is missing session_date/session_type")
+    summary = _text_field(entry, "summary") or ""
+    return (
+        session_date,
+        session_type,
+        pack_text(_text_field(entry, "raw_transcript") or "", compress),
+        pack_text(summary, compress),
+        _headline(summary),
+        _text_field(entry, "work_one_thing"),
+        _text_field(entry, "family_one_thing"),
+        _text_field(entry, "if_then_plan"),
+        _flag_field(entry, "work_done"),
+        _flag_field(entry, "family_done"),
+        _text_field(entry, "distraction_cause"),
+        _text_field(entry, "improvement"),
+        _text_field(entry, "tomorrow_focus"),
+        pack_text(_text_field(entry, "free_text"), compress),
+        _text_field(entry, "created_at") or datetime.utcnow().isoformat(timespec="seconds"),
+        _text_field(entry, "id") or _text_field(entry, "entry_id"),
+        session_content_hash(entry),
+    )
+
+
+def _note_row_from_entry(note: Dict[str, Any]) -> tuple:
+    session_date = _text_field(note, "session_date")
+    if not session_date:
+        raise ValueError("note is missing session_date")
+    return (
+        session_date,
+        _text_field(note, "target_session_type") or "am",
+        _text_field(note, "note_text") or "",
+        _text_field(note, "created_at") or datetime.utcnow().isoformat(timespec="seconds"),
+        _text_field(note, "id") or _text_field(note, "entry_id"),
+        note_content_hash(note),
+    )
+
+
+def _insert_imported(con: sqlite3.Connection, kind: str, row: tuple) -> int:
+    """Inserts an imported session/note row; 0 if the entry is already stored."""
+    # Rows end with created_at, entry_id, content_hash
+    created_at, entry_id, content_hash = row[-3:]
+    table = "notes" if kind == "note" else "sessions"
+    if entry_id and con.execute(_legacy_match_sql(table), (entry_id, content_hash, created_at)).rowcount:
+        return 0
+    if kind == "note":
+        return con.execute(_NOTE_IMPORT_SQL, row).rowcount
+    cur = con.execute(_SESSION_IMPORT_SQL, row)
+    if cur.rowcount and any(isinstance(row[i], bytes) for i in (2, 3, 13)):  # raw_transcript, summary, free_text
+        _index_packed_text(con, cur.lastrowid)
+    return cur.rowcount
+
+
 def insert_session_from_icloud(entry: Dict[str, Any]) -> None:
     with _conn() as con:
-        con.execute(
-            """
-            INSERT INTO sessions (
-                session_date, session_type, raw_transcript, summary,
-                work_one_thing, family_one_thing, if_then_plan,
-                work_done, family_done,
-                distraction_cause, improvement, tomorrow_focus,
-                free_text,
-                created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                entry.get("session_date"),
-                entry.get("session_type"),
-                entry.get("raw_transcript") or "",
-                entry.get("summary") or "",
-                entry.get("work_one_thing"),
-                entry.get("family_one_thing"),
-                entry.get("if_then_plan"),
-                entry.get("work_done"),
-                entry.get("family_done"),
-                entry.get("distraction_cause"),
-                entry.get("improvement"),
-                entry.get("tomorrow_focus"),
-                entry.get("free_text"),
-                entry.get("created_at") or datetime.utcnow().isoformat(timespec="seconds"),
-            ),
+        if _insert_imported(con, "session", _session_row_from_entry(entry, _compress_text())):
+            record_sessions(con, [entry])
+
+
+def get_imported_file_names() -> Set[str]:
+    """All file names already recorded in imported_files, in one query."""
+    with _conn() as con:
+        return {r[0] for r in con.execute("SELECT file_name FROM imported_files")}
+
+
+def filter_imported(names: Iterable[str]) -> Set[str]:
+    """The subset of names already recorded in imported_files."""
+    names = list(names)
+    found: Set[str] = set()
+    with _conn() as con:
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            cur = con.execute(
+                f"SELECT file_name FROM imported_files WHERE file_name IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update(r[0] for r in cur)
+    return found
+
+
+def get_sync_state() -> Dict[str, str]:
+    with _conn() as con:
+        cur = con.execute("SELECT key, value FROM sync_state")
+        return {r[0]: r[1] for r in cur}
+
+
+def set_sync_state(values: Dict[str, str]) -> None:
+    with _conn() as con:
+        con.executemany(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            list(values.items()),
         )
 
-def add_note(session_date: str, target_session_type: str, note_text: str, created_at: Optional[str] = None) -> None:
+
+# Rows are flushed in chunks of this size, all inside the one transaction, so a
+# streamed import never buffers the whole batch.
+IMPORT_CHUNK_SIZE = 500
+
+
+def import_entries(items: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+    """
+    Batched cloud import: one connection, one transaction.
+    items yields (file_name, parsed_entry) and is consumed lazily, so the caller
+    can stream parsed files in while this thread does all the DB writes.
+    Rows are validated before they are queued, and inserted one at a time, so
+    one malformed entry is reported and skipped instead of aborting the batch.
+    Entries already in the DB (by entry id, or a legacy row's own export) are
+    skipped and counted as duplicates; their files are still marked imported.
+    Returns counts of sessions, notes, duplicates and failed entries.
+    """
+    queued: List[Tuple[str, str, tuple, Dict[str, Any]]] = []  # (file name, kind, row, entry)
+    counts = {"sessions": 0, "notes": 0, "duplicates": 0, "failed": 0}
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    compress = _compress_text()
+
+    def flush(con: sqlite3.Connection) -> None:
+        inserted = []
+        markers = []
+        for name, kind, row, entry in queued:
+            # Row by row: rollups must only count the sessions actually inserted,
+            # and a row SQLite still rejects only fails its own file
+            try:
+                added = _insert_imported(con, kind, row)
+            except sqlite3.Error as e:
+                print(f"(sync) WARNING: failed to import {name}: {e}", file=sys.stderr)
+                counts["failed"] += 1
+                continue
+            markers.append((name, now))
+            if not added:
+                counts["duplicates"] += 1
+            elif kind == "note":
+                counts["notes"] += 1
+            else:
+                counts["sessions"] += 1
+                inserted.append(entry)
+        record_sessions(con, inserted)
+        con.executemany(
+            "INSERT OR IGNORE INTO imported_files (file_name, imported_at) VALUES (?, ?)",
+            markers,
+        )
+        queued.clear()
+
     with _conn() as con:
-        con.execute(
+        for name, entry in items:
+            try:
+                if entry.get("entry_kind") == "note":
+                    queued.append((name, "note", _note_row_from_entry(entry), entry))
+                else:
+                    queued.append((name, "session", _session_row_from_entry(entry, compress), entry))
+            except Exception as e:
+                print(f"(sync) WARNING: failed to import {name}: {e}", file=sys.stderr)
+                counts["failed"] += 1
+                continue
+
+            if len(queued) >= IMPORT_CHUNK_SIZE:
+                flush(con)
+
+        if queued:
+            flush(con)
+
+    return counts
+
+def add_note(
+    session_date: str,
+    target_session_type: str,
+    note_text: str,
+    created_at: Optional[str] = None,
+    entry_id: Optional[str] = None,
+    export: bool = False,
+) -> Optional[str]:
+    """
+    Adds an append note (skipped only if its entry_id is already stored).
+    With export, its note file is queued like insert_session's and its name returned.
+    """
+    entry_id = entry_id or new_entry_id()
+    with _conn() as con:
+        cur = con.execute(
             """
-            INSERT INTO notes (session_date, target_session_type, note_text, created_at)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO notes (session_date, target_session_type, note_text, created_at, entry_id, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
             """,
             (
                 session_date,
                 target_session_type,
                 note_text,
                 created_at or datetime.utcnow().isoformat(timespec="seconds"),
+                entry_id,
+                note_content_hash(
+                    {"session_date": session_date, "target_session_type": target_session_type, "note_text": note_text}
+                ),
             ),
         )
+        if export and cur.rowcount:
+            from entries import note_file
+
+            name, text = note_file(session_date, target_session_type, note_text, entry_id)
+            _queue_export(con, name, text)
+            return name
+    return None
 
 
 def get_notes(session_date: str, target_session_type: str) -> List[str]:
@@ -256,19 +700,16 @@ def get_notes(session_date: str, target_session_type: str) -> List[str]:
     return [r[0] for r in rows]
 
 def import_note_from_icloud(note: Dict[str, Any]) -> None:
-    add_note(
-        session_date=note["session_date"],
-        target_session_type=note.get("target_session_type", "am"),
-        note_text=note.get("note_text", ""),
-        created_at=note.get("created_at"),
-    )
+    with _conn() as con:
+        _insert_imported(con, "note", _note_row_from_entry(note))
 
 
 def get_latest_am_full(session_date: str) -> Optional[Dict[str, Any]]:
     with _conn() as con:
         cur = con.execute(
             """
-            SELECT work_one_thing, family_one_thing, if_then_plan, summary, raw_transcript, free_text
+            SELECT work_one_thing, family_one_thing, if_then_plan,
+                   dj_text(summary), dj_text(raw_transcript), dj_text(free_text)
             FROM sessions
             WHERE session_date = ? AND session_type = 'am'
             ORDER BY id DESC
@@ -290,3 +731,204 @@ def get_latest_am_full(session_date: str) -> Optional[Dict[str, Any]]:
         "free_text": row[5],
     }
 
+
+
+def _fts_query(text: str) -> str:
+    """
+    Turns free user input into an FTS5 query: every word must match, and
+    punctuation can't trip the FTS5 query syntax. A trailing * keeps prefix search.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*") if prefix else word
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search(
+    query: str,
+    limit: int = 20,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    session_type: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Full-text search over sessions and notes, best BM25 matches first.
+    session_type filters to 'am'/'pm'/'free' sessions, or 'note' for notes only.
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+
+    parts = []
+    params: List[Any] = []
+
+    def date_filters(alias: str) -> str:
+        sql = ""
+        if date_from:
+            sql += f" AND {alias}.session_date >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += f" AND {alias}.session_date <= ?"
+            params.append(date_to)
+        return sql
+
+    if session_type != "note":
+        params.append(match)
+        sql = """
+            SELECT 'session', s.id, s.session_date, s.session_type,
+                   snippet(sessions_fts, -1, '[', ']', '...', 12), bm25(sessions_fts)
+            FROM sessions_fts
+            JOIN sessions s ON s.id = sessions_fts.rowid
+            WHERE sessions_fts MATCH ?
+        """
+        sql += date_filters("s")
+        if session_type:
+            sql += " AND s.session_type = ?"
+            params.append(session_type)
+        parts.append(sql)
+
+    if session_type in (None, "note"):
+        params.append(match)
+        sql = """
+            SELECT 'note', n.id, n.session_date, 'note',
+                   snippet(notes_fts, 0, '[', ']', '...', 12), bm25(notes_fts)
+            FROM notes_fts
+            JOIN notes n ON n.id = notes_fts.rowid
+            WHERE notes_fts MATCH ?
+        """
+        sql += date_filters("n")
+        parts.append(sql)
+
+    params.append(limit)
+    with _conn() as con:
+        cur = con.execute(" UNION ALL ".join(parts) + " ORDER BY 6 LIMIT ?", params)
+        rows = cur.fetchall()
+
+    return [
+        {"kind": r[0], "id": r[1], "date": r[2], "type": r[3], "snippet": r[4], "rank": r[5]}
+        for r in rows
+    ]
+
+
+def get_accountability_stats(today: date) -> Dict[str, Any]:
+    """Streaks and completion windows from the rollup tables (primary-key lookups only)."""
+    last_week = today - timedelta(days=7)
+    last_month = today.replace(day=1) - timedelta(days=1)
+    windows = [
+        ("This week", "week", today),
+        ("Last week", "week", last_week),
+        ("This month", "month", today),
+        ("Last month", "month", last_month),
+        ("This year", "year", today),
+    ]
+
+    with _conn() as con:
+        streaks = {
+            kind: {
+                "current": rollups.current_streak(con, kind, today),
+                "longest": rollups.longest_streak(con, kind),
+            }
+            for kind in rollups.STREAK_KINDS
+        }
+        periods = []
+        for label, grain, d in windows:
+            stats = rollups.period_stats(con, grain, rollups.period_key(grain, d))
+            stats["label"] = label
+            periods.append(stats)
+
+    return {"streaks": streaks, "periods": periods}
+
+
+# Rows pulled from the cursor per fetchmany() while streaming an export
+EXPORT_FETCH_SIZE = 500
+
+
+def iter_export_rows(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    session_type: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streams every session, then every note, as plain dicts (one per row) with an
+    entry_kind of 'session' or 'note'. session_type 'note' exports notes only;
+    'am'/'pm'/'free' export only sessions of that type.
+    """
+    filters = []
+    params: List[Any] = []
+    if date_from:
+        filters.append("session_date >= ?")
+        params.append(date_from)
+    if date_to:
+        filters.append("session_date <= ?")
+        params.append(date_to)
+    where = " AND ".join(filters)
+
+    tables = []
+    if session_type != "note":
+        tables.append(("session", "sessions", "session_type = ?" if session_type else ""))
+    if session_type in (None, "note"):
+        tables.append(("note", "notes", ""))
+
+    con = _conn()
+    for kind, table, type_filter in tables:
+        clauses = " AND ".join(c for c in (where, type_filter) if c)
+        cur = con.execute(
+            f"SELECT * FROM {table} {'WHERE ' + clauses if clauses else ''} ORDER BY session_date, id",
+            params + ([session_type] if type_filter else []),
+        )
+        columns = [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for r in rows:
+                row = dict(zip(columns, r))
+                row["entry_kind"] = kind
+                for col in COMPRESSED_COLUMNS:
+                    if col in row:
+                        row[col] = unpack_text(row[col])
+                yield row
+
+
+# Sessions rewritten per transaction by convert_text_storage
+CONVERT_PAGE_SIZE = 500
+
+
+def convert_text_storage(compress: bool) -> Dict[str, int]:
+    """
+    Rewrites raw_transcript/summary/free_text of every session compressed
+    (see pack_text) or plain, then VACUUMs. Safe to interrupt and rerun.
+    Returns rows changed and the DB file size in bytes before and after.
+    """
+    con = _conn()
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    before = _db_file_path().stat().st_size
+    changed = 0
+    after = 0
+    while True:
+        with con:
+            rows = con.execute(
+                "SELECT id, raw_transcript, summary, free_text FROM sessions WHERE id > ? ORDER BY id LIMIT ?",
+                (after, CONVERT_PAGE_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            updates = []
+            for session_id, *stored in rows:
+                values = [pack_text(unpack_text(v), compress) for v in stored]
+                if values != stored:
+                    updates.append((*values, session_id))
+            con.executemany(
+                "UPDATE sessions SET raw_transcript = ?, summary = ?, free_text = ? WHERE id = ?", updates
+            )
+            for *values, session_id in updates:
+                if any(isinstance(value, bytes) for value in values):
+                    _index_packed_text(con, session_id)
+        changed += len(updates)
+        after = rows[-1][0]
+
+    con.execute("VACUUM")
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {"changed": changed, "before": before, "after": _db_file_path().stat().st_size}
@@ -0,0 +1,22 @@
+# tests/conftest.py
+from types import SimpleNamespace
+
+import pytest
+
+import store
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """A fresh DB, sync dir and home (config.toml) under tmp_path."""
+    home = tmp_path / "home"
+    home.mkdir()
+    (tmp_path / "sync").mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("APPDATA", raising=False)
+    monkeypatch.setenv("DAILYJOURNAL_DB_PATH", str(tmp_path / "db" / "coachscribe.db"))
+    monkeypatch.setenv("DAILYJOURNAL_SYNC_DIR", str(tmp_path / "sync"))
+    store.close_db()
+    store.init_db()
+    yield SimpleNamespace(sync_dir=tmp_path / "sync", home=home)
+    store.close_db()
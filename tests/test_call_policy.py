@@ -0,0 +1,153 @@
+# tests/test_call_policy.py
+"""
+coach._call_with_policy against a local fake Responses API (http.server),
+reached through openai_base_url.
+"""
+import json
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("keyring")
+
+import coach
+from config import AppConfig
+
+REPLY = {"summary": "Work One Thing: ship it"}
+
+
+def _response_body(text: str) -> bytes:
+    return json.dumps({
+        "id": "resp_test",
+        "object": "response",
+        "created_at": 0,
+        "model": "test-model",
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_test",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": 10,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": 5,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": 15,
+        },
+    }).encode("utf-8")
+
+
+class FakeServer:
+    """
+    Answers POST /v1/responses from a script: one (status, delay_s) per request,
+    the last one repeated. Records the arrival time of every request.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.arrivals = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with server._lock:
+                    n = len(server.arrivals)
+                    server.arrivals.append(time.monotonic())
+                status, delay = server.script[min(n, len(server.script) - 1)]
+                time.sleep(delay)
+                body = _response_body(json.dumps(REPLY)) if status == 200 else b'{"error": {"message": "busy"}}'
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up on this request
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    servers = []
+
+    def start(script, **policy):
+        server = FakeServer(script)
+        servers.append(server)
+        cfg = replace(AppConfig.defaults(), openai_base_url=server.url, **policy)
+        monkeypatch.setattr(coach, "load_config", lambda: cfg)
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        coach._make_client.cache_clear()
+        return server
+
+    yield start
+    coach._make_client.cache_clear()
+    for server in servers:
+        server.close()
+
+
+def test_transient_error_is_retried(serve):
+    server = serve([(503, 0), (200, 0)], llm_max_retries=2, llm_timeout_s=5, llm_deadline_s=10)
+    info = {}
+
+    text = coach._call_with_policy("test-model", {"mode": "am"}, info=info)
+
+    assert json.loads(text) == REPLY
+    assert len(server.arrivals) == 2
+    assert info["retries"] == 1
+    assert info["input_tokens"] == 10
+
+
+def test_retries_stop_at_max(serve):
+    server = serve([(503, 0)], llm_max_retries=1, llm_timeout_s=5, llm_deadline_s=10)
+
+    with pytest.raises(coach.APIStatusError):
+        coach._call_with_policy("test-model", {"mode": "am"})
+    assert len(server.arrivals) == 2
+
+
+def test_slow_reply_is_hedged(serve):
+    server = serve(
+        [(200, 3.0), (200, 0)],
+        llm_hedge_after_s=0.2, llm_max_retries=0, llm_timeout_s=5, llm_deadline_s=10,
+    )
+
+    started = time.monotonic()
+    text = coach._call_with_policy("test-model", {"mode": "am"})
+    elapsed = time.monotonic() - started
+
+    assert json.loads(text) == REPLY
+    assert len(server.arrivals) == 2
+    assert elapsed < 2.0
+
+
+def test_fast_reply_is_not_hedged(serve):
+    server = serve([(200, 0)], llm_hedge_after_s=1.0, llm_max_retries=0, llm_timeout_s=5, llm_deadline_s=10)
+
+    coach._call_with_policy("test-model", {"mode": "am"})
+    time.sleep(1.2)
+
+    assert len(server.arrivals) == 1
@@ -0,0 +1,111 @@
+# tests/test_compression.py
+import sqlite3
+from dataclasses import replace
+
+import pytest
+
+import store
+from config import load_config, save_config
+
+LONG = "Work One Thing: ship the release notes before lunch.\n" * 8
+
+
+@pytest.fixture
+def compressed(journal):
+    save_config(replace(load_config(), compress_text=True))
+
+
+def _ids(query: str) -> list:
+    return [r["id"] for r in store.search(query)]
+
+
+def _stored_types(session_id: int) -> tuple:
+    with store._conn() as con:
+        return con.execute(
+            "SELECT typeof(raw_transcript), typeof(summary), typeof(free_text) FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+
+
+def test_resummarize_keeps_other_compressed_columns_searchable(compressed):
+    resummarize = pytest.importorskip("resummarize")  # needs keyring
+    store.insert_session({
+        "session_date": "2026-03-02", "session_type": "am",
+        "raw_transcript": "AM Q1: zebraword\n" + LONG, "summary": LONG, "free_text": "quagga\n" + LONG,
+    })
+    assert _stored_types(1) == ("blob", "blob", "blob")
+    assert _ids("zebraword") == [1]
+
+    resummarize._apply("job", 1, "Work One Thing: okapi\n" + LONG)
+
+    assert _ids("zebraword") == [1]
+    assert _ids("quagga") == [1]
+    assert _ids("okapi") == [1]
+
+
+@pytest.mark.parametrize("text", [LONG, "Stress Trigger: réunions ☕\n" * 20])
+def test_pack_round_trip(text):
+    packed = store.pack_text(text, compress=True)
+
+    assert isinstance(packed, bytes) and len(packed) < len(text.encode("utf-8"))
+    assert store.unpack_text(packed) == text
+
+
+def test_short_text_stays_plain():
+    assert store.pack_text("short", compress=True) == "short"
+    assert store.unpack_text("short") == "short"
+    assert store.pack_text(LONG, compress=False) == LONG
+    assert store.pack_text(None, compress=True) is None
+
+
+def test_compressed_columns_read_back_through_sql(compressed):
+    store.insert_session({
+        "session_date": "2026-03-02", "session_type": "am",
+        "raw_transcript": LONG, "summary": LONG, "free_text": "zebraword\n" + LONG,
+    })
+    assert _stored_types(1) == ("blob", "blob", "blob")
+
+    with store._conn() as con:
+        assert con.execute("SELECT dj_text(summary) FROM sessions").fetchone()[0] == LONG
+    assert store.get_latest_am_full("2026-03-02")["free_text"] == "zebraword\n" + LONG
+    assert "[zebraword]" in store.search("zebraword")[0]["snippet"]
+    [row] = [r for r in store.iter_export_rows() if r["entry_kind"] == "session"]
+    assert row["raw_transcript"] == LONG
+
+
+def test_convert_round_trip_keeps_text_and_search(journal):
+    texts = [f"Day {i} okapi{i}\n" + LONG for i in range(3)]
+    for i, text in enumerate(texts):
+        store.insert_session({
+            "session_date": f"2026-03-0{i + 1}", "session_type": "free", "raw_transcript": text, "summary": text,
+        })
+
+    assert store.convert_text_storage(True)["changed"] == 3
+    assert {_stored_types(i) for i in (1, 2, 3)} == {("blob", "blob", "null")}
+    assert [_ids(f"okapi{i}") for i in range(3)] == [[1], [2], [3]]
+
+    assert store.convert_text_storage(False)["changed"] == 3
+    with store._conn() as con:
+        assert [r[0] for r in con.execute("SELECT raw_transcript FROM sessions ORDER BY id")] == texts
+    assert [_ids(f"okapi{i}") for i in range(3)] == [[1], [2], [3]]
+
+
+def test_plain_sqlite_client_can_write_a_compressed_db(compressed):
+    store.insert_session({"session_date": "2026-03-02", "session_type": "free", "raw_transcript": LONG, "summary": LONG})
+    db_path = store._db_file_path()
+    store.close_db()
+
+    # No dj_text() here: the schema must not need it
+    con = sqlite3.connect(db_path)
+    with con:
+        con.execute(
+            "INSERT INTO sessions (session_date, session_type, raw_transcript, summary, created_at)"
+            " VALUES ('2026-03-03', 'free', 'frobnitz', 's', '2026-03-03T07:00:00')"
+        )
+        con.execute("UPDATE sessions SET summary = 'updated quux' WHERE id = 1")
+        con.execute("DELETE FROM sessions WHERE id = 1")
+        con.execute("INSERT INTO sessions_fts (sessions_fts) VALUES ('integrity-check')")
+    con.close()
+
+    assert _ids("frobnitz") == [2]
+    assert _ids("quux") == []
@@ -0,0 +1,139 @@
+# tests/test_entry_ids.py
+import sqlite3
+
+import pytest
+
+import rollups
+import store
+from migrations import MIGRATIONS, migrate
+
+LOCAL = "2026-03-02T07:00:00"  # local inserts: no "Z"
+IMPORTED_SOON = "2026-03-02T07:00:03Z"  # entry files: UTC with "Z"
+IMPORTED_LATER = "2026-03-02T19:00:00Z"
+
+
+@pytest.fixture
+def legacy_con():
+    """A DB at schema v10: before entry ids and content hashes were stored."""
+    con = sqlite3.connect(":memory:")
+    for migration in MIGRATIONS[:10]:
+        migration(con)
+    con.execute("PRAGMA user_version = 10")
+    con.commit()
+    yield con
+    con.close()
+
+
+def _add_session(con: sqlite3.Connection, created_at: str, text: str = "alpha") -> None:
+    con.execute(
+        "INSERT INTO sessions (session_date, session_type, raw_transcript, summary, created_at)"
+        " VALUES ('2026-03-02', 'am', ?, ?, ?)",
+        (text, text, created_at),
+    )
+
+
+def _add_note(con: sqlite3.Connection, created_at: str) -> None:
+    con.execute(
+        "INSERT INTO notes (session_date, target_session_type, note_text, created_at)"
+        " VALUES ('2026-03-02', 'am', 'called mom', ?)",
+        (created_at,),
+    )
+
+
+def _ids(con: sqlite3.Connection, table: str) -> list:
+    return [r[0] for r in con.execute(f"SELECT id FROM {table} ORDER BY id")]
+
+
+def test_migration_removes_only_self_import_duplicates(legacy_con):
+    _add_session(legacy_con, LOCAL)
+    _add_session(legacy_con, IMPORTED_SOON)  # its own export, imported back
+    _add_session(legacy_con, "2026-03-02T19:00:00")  # same words, typed again that evening
+    _add_note(legacy_con, "2026-03-02T08:00:00")
+    _add_note(legacy_con, "2026-03-02T08:00:04")  # the same note, entered twice in a row
+    _add_note(legacy_con, "2026-03-02T08:00:02Z")  # the first one's export, imported back
+    legacy_con.commit()
+
+    migrate(legacy_con)
+
+    assert _ids(legacy_con, "sessions") == [1, 3]
+    assert _ids(legacy_con, "notes") == [1, 2]
+    assert rollups.period_stats(legacy_con, "day", "2026-03-02")["am"] == 2
+
+
+def test_migration_keeps_identical_imports(legacy_con):
+    # Two identical entries from another machine: both imported, neither local
+    _add_session(legacy_con, "2026-03-02T07:00:00Z")
+    _add_session(legacy_con, "2026-03-02T07:00:05Z")
+    legacy_con.commit()
+
+    migrate(legacy_con)
+
+    assert _ids(legacy_con, "sessions") == [1, 2]
+
+
+def _legacy_local_row(created_at: str = LOCAL) -> None:
+    entry = {"session_date": "2026-03-02", "session_type": "am", "raw_transcript": "alpha", "summary": "alpha"}
+    with store._conn() as con:
+        con.execute(
+            "INSERT INTO sessions (session_date, session_type, raw_transcript, summary, created_at, content_hash)"
+            " VALUES ('2026-03-02', 'am', 'alpha', 'alpha', ?, ?)",
+            (created_at, store.session_content_hash(entry)),
+        )
+
+
+def _entry(entry_id: str, created_at: str) -> dict:
+    return {
+        "id": entry_id, "session_date": "2026-03-02", "session_type": "am",
+        "raw_transcript": "alpha", "summary": "alpha", "created_at": created_at,
+    }
+
+
+def _entry_ids() -> list:
+    with store._conn() as con:
+        return [r[0] for r in con.execute("SELECT entry_id FROM sessions ORDER BY id")]
+
+
+def test_import_adopts_a_legacy_rows_own_export(journal):
+    _legacy_local_row()
+
+    counts = store.import_entries([("own.json", _entry("e1", IMPORTED_SOON))])
+
+    assert counts["duplicates"] == 1
+    assert _entry_ids() == ["e1"]
+
+
+def test_import_keeps_identical_entries_made_later(journal):
+    _legacy_local_row()
+
+    counts = store.import_entries([("later.json", _entry("e2", IMPORTED_LATER))])
+
+    assert counts["sessions"] == 1
+    assert _entry_ids() == [None, "e2"]
+
+
+def test_import_never_matches_an_imported_legacy_row(journal):
+    _legacy_local_row(created_at="2026-03-02T07:00:00Z")
+
+    counts = store.import_entries([("other.json", _entry("e3", IMPORTED_SOON))])
+
+    assert counts["sessions"] == 1
+
+
+def test_import_skips_an_entry_id_already_stored(journal):
+    counts = store.import_entries([("a.json", _entry("e4", IMPORTED_SOON)), ("b.json", _entry("e4", IMPORTED_LATER))])
+
+    assert counts == {"sessions": 1, "notes": 0, "duplicates": 1, "failed": 0}
+    assert store.filter_imported(["a.json", "b.json"]) == {"a.json", "b.json"}
+
+
+def test_insert_session_skips_an_entry_id_already_stored(journal):
+    payload = {"session_date": "2026-03-02", "session_type": "free", "raw_transcript": "x", "summary": "x"}
+
+    name = store.insert_session(dict(payload), export=True)
+    entry_id = _entry_ids()[0]
+
+    assert name is not None
+    assert store.insert_session({**payload, "entry_id": entry_id}, export=True) is None
+    assert _entry_ids() == [entry_id]
+    with store._conn() as con:
+        assert con.execute("SELECT COUNT(*) FROM export_outbox").fetchone()[0] == 1
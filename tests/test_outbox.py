@@ -0,0 +1,115 @@
+# tests/test_outbox.py
+import json
+import time
+
+import pytest
+
+import app
+import outbox
+import store
+from entries import entry_file, write_entry_file
+
+
+def _payload(day: str, text: str) -> dict:
+    return {"session_date": day, "session_type": "free", "raw_transcript": text, "summary": text}
+
+
+def _count_full_scans(monkeypatch) -> list:
+    scans = []
+    real = app.get_imported_file_names
+
+    def counting():
+        scans.append(1)
+        return real()
+
+    monkeypatch.setattr(app, "get_imported_file_names", counting)
+    return scans
+
+
+def test_own_export_keeps_the_sync_fast_path(journal, monkeypatch):
+    app.sync_from_icloud_on_startup()
+    store.insert_session(_payload("2026-03-02", "mine"), export=True)
+    assert outbox.flush() == 1
+
+    scans = _count_full_scans(monkeypatch)
+    app.sync_from_icloud_on_startup()
+    assert scans == []
+
+
+def test_foreign_file_before_a_flush_is_still_imported(journal, monkeypatch):
+    app.sync_from_icloud_on_startup()
+    time.sleep(0.05)
+    name, text = entry_file(_payload("2026-03-01", "from the laptop"))
+    write_entry_file(journal.sync_dir, name, text)
+    time.sleep(0.05)
+    store.insert_session(_payload("2026-03-02", "mine"), export=True)
+    outbox.flush()
+
+    scans = _count_full_scans(monkeypatch)
+    app.sync_from_icloud_on_startup()
+    assert scans == [1]
+    with store._conn() as con:
+        assert con.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 2
+
+
+def _pending_names() -> list:
+    with store._conn() as con:
+        return [r[0] for r in con.execute("SELECT file_name FROM export_outbox ORDER BY id")]
+
+
+def _files(journal) -> list:
+    return sorted(p.name for p in journal.sync_dir.iterdir())
+
+
+def test_export_is_written_only_on_flush(journal):
+    name = store.insert_session(_payload("2026-03-02", "mine"), export=True)
+
+    assert _pending_names() == [name]
+    assert _files(journal) == []
+    assert outbox.flush() == 1
+    assert _pending_names() == []
+    assert _files(journal) == [name]
+    assert json.loads((journal.sync_dir / name).read_text(encoding="utf-8"))["raw_transcript"] == "mine"
+
+
+def test_failed_write_is_retried_by_the_next_flush(journal, monkeypatch):
+    names = [store.insert_session(_payload(f"2026-03-0{i}", f"entry {i}"), export=True) for i in (1, 2, 3)]
+    real = outbox.write_entry_file
+
+    def full_disk(sync_dir, name, text, durability):
+        if name == names[1]:
+            raise OSError(28, "No space left on device")
+        return real(sync_dir, name, text, durability)
+
+    monkeypatch.setattr(outbox, "write_entry_file", full_disk)
+    assert outbox.flush() == 1
+    assert _pending_names() == names[1:]
+
+    monkeypatch.setattr(outbox, "write_entry_file", real)
+    assert outbox.flush() == 2
+    assert _files(journal) == sorted(names)
+
+
+def test_replay_after_a_crash_rewrites_the_same_file(journal):
+    # A crash after the file was written but before its row was deleted
+    name = store.insert_session(_payload("2026-03-02", "mine"), export=True)
+    with store._conn() as con:
+        body = con.execute("SELECT body FROM export_outbox").fetchone()[0]
+    write_entry_file(journal.sync_dir, name, body)
+
+    assert outbox.pending() == 1
+    assert outbox.flush() == 1
+    assert _files(journal) == [name]
+
+    # The file is this machine's own export: sync never imports it back
+    app.sync_from_icloud_on_startup(full=True)
+    with store._conn() as con:
+        assert con.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] == 1
+
+
+@pytest.mark.parametrize("durability", ["none", "rename", "fsync"])
+def test_durability_modes_write_the_same_file(journal, durability):
+    path = write_entry_file(journal.sync_dir, "2026-03-02_free_x.json", '{"a": 1}', durability)
+
+    assert path.read_text(encoding="utf-8") == '{"a": 1}'
+    assert _files(journal) == ["2026-03-02_free_x.json"]
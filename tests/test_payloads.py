@@ -0,0 +1,29 @@
+# tests/test_payloads.py
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("keyring")
+
+import coach
+
+AM = {
+    "work_one_thing": "Ship 3178",
+    "family_one_thing": "Dinner at 6",
+    "if_then_plan": "If I reach for my phone, then I will stand up",
+}
+
+
+def test_pm_payload_keeps_the_am_stress_trigger():
+    am = {**AM, "raw_transcript": "AM Q1: Ship 3178\nAM Q3: back-to-back meetings\nAM Q4: stand up"}
+
+    payload = coach.pm_payload(am, ["done", "yes", "meetings", "block time"])
+
+    assert payload["am_commitments"]["stress_trigger"] == "back-to-back meetings"
+    assert "raw_transcript" not in payload["am_commitments"]
+
+
+def test_stress_trigger_falls_back_to_the_am_summary():
+    am = {**AM, "raw_transcript": "", "summary": "Work One Thing: Ship 3178\nStress Trigger: fatigue\n"}
+
+    assert coach.pm_payload(am, [])["am_commitments"]["stress_trigger"] == "fatigue"
+    assert coach.pm_payload(AM, [])["am_commitments"]["stress_trigger"] is None
@@ -0,0 +1,81 @@
+# tests/test_rollups.py
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import rollups
+from migrations import migrate
+
+DAY0 = date(2026, 3, 2)  # a Monday
+
+
+@pytest.fixture
+def con():
+    con = sqlite3.connect(":memory:")
+    migrate(con)
+    yield con
+    con.close()
+
+
+def _pm(offset: int, work_done: int = 1) -> dict:
+    return {
+        "session_date": (DAY0 + timedelta(days=offset)).isoformat(),
+        "session_type": "pm",
+        "work_done": work_done,
+        "family_done": 0,
+    }
+
+
+def _streaks(con: sqlite3.Connection, today: date) -> dict:
+    # Only run endpoints are kept exact, so compare what readers see
+    return {
+        kind: (
+            rollups.longest_streak(con, kind),
+            rollups.current_streak(con, kind, today),
+            rollups.current_streak(con, kind, today + timedelta(days=1)),
+        )
+        for kind in rollups.STREAK_KINDS
+    }
+
+
+def test_late_day_joins_two_streaks(con):
+    # Days 0-2 and 4-5, then day 3 arrives late (e.g. synced from another machine)
+    rollups.record_sessions(con, [_pm(i) for i in (0, 1, 2, 4, 5)])
+    assert rollups.longest_streak(con, "journal")["length"] == 3
+    assert rollups.current_streak(con, "journal", DAY0 + timedelta(days=5)) == 2
+
+    rollups.record_sessions(con, [_pm(3)])
+
+    assert rollups.longest_streak(con, "journal") == {
+        "length": 6,
+        "start": DAY0.isoformat(),
+        "end": (DAY0 + timedelta(days=5)).isoformat(),
+    }
+    assert rollups.current_streak(con, "journal", DAY0 + timedelta(days=5)) == 6
+    assert rollups.current_streak(con, "work", DAY0 + timedelta(days=6)) == 6
+
+
+def test_late_days_match_rebuild(con):
+    early = [_pm(i, work_done=i % 4 != 1) for i in (0, 1, 2, 4, 5, 7)]
+    late = [_pm(3), _pm(6, work_done=0)]
+    rollups.record_sessions(con, early)
+    rollups.record_sessions(con, late)
+    incremental = _streaks(con, DAY0 + timedelta(days=7))
+
+    con.executemany(
+        "INSERT INTO sessions (session_date, session_type, raw_transcript, summary, work_done, family_done, created_at)"
+        " VALUES (?, 'pm', '', '', ?, 0, '2026-03-10T00:00:00')",
+        [(s["session_date"], int(s["work_done"])) for s in early + late],
+    )
+    rollups.rebuild(con)
+
+    assert _streaks(con, DAY0 + timedelta(days=7)) == incremental
+
+
+def test_repeated_day_is_counted_not_restreaked(con):
+    rollups.record_sessions(con, [_pm(0), _pm(1)])
+    rollups.record_sessions(con, [_pm(1)])
+
+    assert rollups.longest_streak(con, "journal")["length"] == 2
+    assert rollups.period_stats(con, "week", rollups.period_key("week", DAY0))["pm"] == 3
@@ -0,0 +1,111 @@
+# tests/test_segments.py
+import json
+
+import pytest
+
+import app
+import segments
+import store
+from entries import entry_file, write_entry_file
+from segments import compact_sync_dir, iter_segment_files, read_segment_entries, read_segment_index, write_segment
+
+
+def _record(day: str, text: str) -> tuple:
+    name, body = entry_file({
+        "session_date": day, "session_type": "free", "raw_transcript": text, "summary": text,
+    })
+    return name, json.loads(body)
+
+
+def _session_count() -> int:
+    with store._conn() as con:
+        return con.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def test_segment_that_fails_partway_is_retried(journal, monkeypatch):
+    records = [_record(f"2026-01-0{i}", f"entry {i}") for i in (1, 2, 3)]
+    seg = write_segment(journal.sync_dir, "2026-01", records)
+
+    def read_then_fail(path, names=None):
+        # An iCloud placeholder can fail mid-read
+        entries = read_segment_entries(path, names)
+        yield next(entries)
+        raise OSError("Resource deadlock avoided")
+
+    monkeypatch.setattr(app, "read_segment_entries", read_then_fail)
+    app.sync_from_icloud_on_startup()
+    assert _session_count() == 1
+    assert not store.filter_imported([seg.name])
+
+    monkeypatch.setattr(app, "read_segment_entries", read_segment_entries)
+    app.sync_from_icloud_on_startup()
+    assert _session_count() == 3
+    assert store.filter_imported([seg.name]) == {seg.name}
+
+
+def _loose(journal, day: str, text: str) -> str:
+    name, body = entry_file({"session_date": day, "session_type": "free", "raw_transcript": text, "summary": text})
+    write_entry_file(journal.sync_dir, name, body)
+    return name
+
+
+def _loose_names(journal) -> set:
+    return {p.name for p in journal.sync_dir.glob("*.json")}
+
+
+def test_compact_packs_old_months_and_removes_loose_files(journal):
+    old = {_loose(journal, "2026-01-05", "a"), _loose(journal, "2026-01-20", "b"), _loose(journal, "2026-02-01", "c")}
+    current = _loose(journal, "2026-03-02", "d")
+
+    counts = compact_sync_dir("2026-03")
+
+    assert counts == {"segments": 2, "packed": 3, "removed": 3, "failed": 0}
+    assert _loose_names(journal) == {current}
+    packed = {name for seg in iter_segment_files() for name, _, _ in read_segment_index(seg)}
+    assert packed == old
+
+    app.sync_from_icloud_on_startup(full=True)
+    assert _session_count() == 4
+
+
+def test_compact_keeps_loose_files_when_the_segment_is_not_written(journal, monkeypatch):
+    names = {_loose(journal, "2026-01-05", "a"), _loose(journal, "2026-01-06", "b")}
+
+    def disk_full(*args):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(segments, "write_segment", disk_full)
+    with pytest.raises(OSError):
+        compact_sync_dir("2026-03")
+
+    assert _loose_names(journal) == names
+    assert iter_segment_files() == []
+
+
+def test_interrupted_compact_is_finished_without_repacking(journal):
+    # Killed after the segment was renamed into place, before the loose files went
+    names = [_loose(journal, "2026-01-05", "a"), _loose(journal, "2026-01-06", "b")]
+    write_segment(journal.sync_dir, "2026-01", [
+        (name, json.loads((journal.sync_dir / name).read_text(encoding="utf-8"))) for name in names
+    ])
+
+    # Meanwhile, sync imports each entry once, loose or packed
+    app.sync_from_icloud_on_startup(full=True)
+    assert _session_count() == 2
+
+    counts = compact_sync_dir("2026-03")
+
+    assert counts == {"segments": 0, "packed": 0, "removed": 2, "failed": 0}
+    assert _loose_names(journal) == set()
+    assert len(iter_segment_files()) == 1
+
+
+def test_unreadable_file_is_left_loose(journal):
+    good = _loose(journal, "2026-01-05", "a")
+    (journal.sync_dir / "2026-01-06_free_broken.json").write_text("{not json", encoding="utf-8")
+
+    counts = compact_sync_dir("2026-03")
+
+    assert counts == {"segments": 1, "packed": 1, "removed": 1, "failed": 1}
+    assert _loose_names(journal) == {"2026-01-06_free_broken.json"}
+    assert good not in _loose_names(journal)
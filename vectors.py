@@ -0,0 +1,236 @@
+# vectors.py
+"""
+Local vector index for "days like today" (`dailyjournal similar`).
+
+Each AM/PM/free session is embedded from its summary, distraction cause and
+that day's append notes. Vectors are L2-normalized float32 rows appended to
+a flat file next to the DB (coachscribe.db.vectors); vector_rows maps each
+row number to its session. The file is memory-mapped with NumPy, so top-k
+cosine similarity is one matrix-vector product however long the history is.
+Without NumPy the same file is scanned in pure Python (slower, same results).
+
+The index is updated incrementally: only sessions without a row are
+embedded, in batches. The embedding backend is set by embedding_backend in
+config.toml:
+
+    hash     deterministic feature hashing of words and word pairs; offline,
+             free, good enough for recurring themes (default)
+    openai   OpenAI embeddings (embedding_model)
+
+Switching backends (or models) rebuilds the index on the next update.
+Sessions whose summaries were rewritten (resummarize) keep their old vector
+until `similar --rebuild`.
+"""
+import hashlib
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import load_config
+from store import _conn, _db_file_path
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+HASH_DIM = 256
+EMBED_BATCH = 128
+_WORD = re.compile(r"\w+")
+
+
+def _hash_embed(texts: List[str]) -> List[List[float]]:
+    out = []
+    for text in texts:
+        vec = [0.0] * HASH_DIM
+        words = _WORD.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % HASH_DIM] += 1.0 if (h >> 63) else -1.0
+        out.append(vec)
+    return out
+
+
+def _openai_embed(texts: List[str]) -> List[List[float]]:
+    from coach import _client
+
+    response = _client().embeddings.create(model=load_config().embedding_model, input=texts)
+    return [d.embedding for d in response.data]
+
+
+# name -> (embed(texts) -> vectors, identity that must match for vectors to be comparable)
+BACKENDS: Dict[str, Tuple[Callable[[List[str]], List[List[float]]], Callable[[], str]]] = {
+    "hash": (_hash_embed, lambda: f"hash-{HASH_DIM}"),
+    "openai": (_openai_embed, lambda: f"openai-{load_config().embedding_model}"),
+}
+
+
+def _backend() -> Tuple[Callable[[List[str]], List[List[float]]], str]:
+    name = load_config().embedding_backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding_backend {name!r} (choose from {', '.join(BACKENDS)})")
+    embed, identity = BACKENDS[name]
+    return embed, identity()
+
+
+def _normalized(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vec))
+    return [x / norm for x in vec] if norm else vec
+
+
+def vectors_path() -> Path:
+    return Path(str(_db_file_path()) + ".vectors")
+
+
+def _meta() -> Dict[str, str]:
+    with _conn() as con:
+        return dict(con.execute("SELECT key, value FROM vector_meta").fetchall())
+
+
+def _reset(identity: str, dim: int) -> None:
+    vectors_path().unlink(missing_ok=True)
+    with _conn() as con:
+        con.execute("DELETE FROM vector_rows")
+        con.execute("DELETE FROM vector_meta")
+        con.executemany(
+            "INSERT INTO vector_meta (key, value) VALUES (?, ?)", [("backend", identity), ("dim", str(dim))]
+        )
+
+
+def _indexed_rows() -> int:
+    with _conn() as con:
+        return con.execute("SELECT COUNT(*) FROM vector_rows").fetchone()[0]
+
+
+def session_text(summary: Optional[str], distraction_cause: Optional[str], notes: Optional[str]) -> str:
+    return "\n".join(part for part in (summary, distraction_cause, notes) if part)
+
+
+def _unindexed(batch: int) -> Iterator[List[Tuple[int, str]]]:
+    after = 0
+    while True:
+        with _conn() as con:
+            rows = con.execute(
+                """
+                SELECT s.id, dj_text(s.summary), s.distraction_cause,
+                       CASE WHEN s.session_type = 'am' THEN (
+                           SELECT group_concat(n.note_text, char(10)) FROM notes n
+                           WHERE n.session_date = s.session_date AND n.target_session_type = 'am'
+                       ) END
+                FROM sessions s
+                WHERE s.id > ? AND NOT EXISTS (SELECT 1 FROM vector_rows v WHERE v.session_id = s.id)
+                ORDER BY s.id
+                LIMIT ?
+                """,
+                (after, batch),
+            ).fetchall()
+        if not rows:
+            return
+        yield [(r[0], session_text(r[1], r[2], r[3])) for r in rows]
+        after = rows[-1][0]
+
+
+def update_index(rebuild: bool = False) -> int:
+    """Embeds sessions that have no vector yet; returns how many were added."""
+    embed, identity = _backend()
+    meta = _meta()
+    path = vectors_path()
+    row = _indexed_rows()
+    size = path.stat().st_size if path.exists() else 0
+    if rebuild or meta.get("backend") != identity or size < row * int(meta.get("dim", 0)) * 4:
+        # New backend, or the vector file is missing/short: start over
+        _reset(identity, len(embed(["probe"])[0]))
+        meta, row = _meta(), 0
+    dim = int(meta["dim"])
+
+    # Rows written to the file but never committed to vector_rows (crash) are cut off
+    with open(path, "ab") as f:
+        f.truncate(row * dim * 4)
+
+    added = 0
+    for batch in _unindexed(EMBED_BATCH):
+        vectors = embed([text for _, text in batch])
+        data = array("f")
+        for vec in vectors:
+            data.extend(_normalized(vec))
+        with open(path, "ab") as f:
+            f.write(data.tobytes())
+        with _conn() as con:
+            con.executemany(
+                "INSERT INTO vector_rows (row, session_id) VALUES (?, ?)",
+                [(row + i, session_id) for i, (session_id, _) in enumerate(batch)],
+            )
+        row += len(batch)
+        added += len(batch)
+    return added
+
+
+def _scores(query: List[float], dim: int, rows: int) -> Any:
+    path = vectors_path()
+    if np is not None:
+        matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim))
+        return matrix @ np.asarray(query, dtype=np.float32)
+    data = array("f")
+    with open(path, "rb") as f:
+        data.fromfile(f, rows * dim)
+    return [sum(a * b for a, b in zip(query, data[i * dim:(i + 1) * dim])) for i in range(rows)]
+
+
+def _top_k(scores: Any, k: int) -> List[int]:
+    if np is not None:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-scores[top])]]
+    return sorted(range(len(scores)), key=lambda i: -scores[i])[:k]
+
+
+def similar(text: str, k: int = 5, exclude_date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Sessions most similar to text (other than exclude_date's), best first, with score/date/type/headline."""
+    embed, _ = _backend()
+    meta = _meta()
+    rows = _indexed_rows()
+    if not rows or not text.strip():
+        return []
+    dim = int(meta["dim"])
+    scores = _scores(_normalized(embed([text])[0]), dim, rows)
+
+    # Over-fetch so the excluded day's sessions don't leave the list short
+    order = _top_k(scores, k + 8 if exclude_date else k)
+    with _conn() as con:
+        results = []
+        for row in order:
+            hit = con.execute(
+                """
+                SELECT s.id, s.session_date, s.session_type, s.summary_headline
+                FROM vector_rows v JOIN sessions s ON s.id = v.session_id
+                WHERE v.row = ?
+                """,
+                (row,),
+            ).fetchone()
+            if hit and hit[1] != exclude_date:
+                results.append(
+                    {"score": float(scores[row]), "id": hit[0], "date": hit[1], "type": hit[2], "headline": hit[3]}
+                )
+    return results[:k]
+
+
+def session_query(session_date: str) -> Optional[str]:
+    """Text of the latest session on session_date, to search for days like it."""
+    with _conn() as con:
+        row = con.execute(
+            """
+            SELECT dj_text(s.summary), s.distraction_cause,
+                   (SELECT group_concat(n.note_text, char(10)) FROM notes n
+                    WHERE n.session_date = s.session_date AND n.target_session_type = 'am')
+            FROM sessions s
+            WHERE s.session_date = ?
+            ORDER BY s.id DESC
+            LIMIT 1
+            """,
+            (session_date,),
+        ).fetchone()
+    if not row:
+        return None
+    return session_text(row[0], row[1], row[2])